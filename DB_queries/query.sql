@@ -37,6 +37,41 @@ CREATE TABLE events (
 
 ALTER TABLE events ADD COLUMN recurrence_rule TEXT;
 
+-- Upper bound on when a recurring event's last occurrence ends, derived
+-- from UNTIL/COUNT by the application; NULL means open-ended or unknown.
+-- Lets occurrence and conflict queries skip rules that finished long ago.
+ALTER TABLE events ADD COLUMN recurrence_end TIMESTAMP;
+
+CREATE INDEX idx_events_user_recurrence_end ON events (user_id, recurrence_end)
+    WHERE recurrence_rule IS NOT NULL;
+
+-- Current version number, bumped in the same UPDATE that changes the event
+-- so concurrent editors serialise on the row lock instead of racing on
+-- MAX(version_number) + 1.
+ALTER TABLE events ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+
+-- Backs keyset pagination of a user's events ordered by (start_time, id).
+CREATE INDEX idx_events_user_start_id ON events (user_id, start_time, id);
+
+-- An event's time as a range: [start, end), or the single instant at start
+-- when it has no (or no positive) duration. Conflict checks compare periods
+-- with && so they can use the GiST index below.
+CREATE OR REPLACE FUNCTION event_period(start_time TIMESTAMP, end_time TIMESTAMP)
+RETURNS tsrange AS $$
+    SELECT CASE WHEN end_time > start_time
+                THEN tsrange(start_time, end_time, '[)')
+                ELSE tsrange(start_time, start_time, '[]')
+           END
+$$ LANGUAGE sql IMMUTABLE;
+
+-- btree_gist lets user_id share the GiST index with the period range.
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+-- Overlap lookups for one-off events; recurring events are expanded in the app.
+CREATE INDEX idx_events_user_period ON events
+    USING gist (user_id, event_period(start_time, end_time))
+    WHERE recurrence_rule IS NULL;
+
 
 CREATE TABLE event_permissions (
     id SERIAL PRIMARY KEY,
@@ -48,6 +83,9 @@ CREATE TABLE event_permissions (
     UNIQUE (event_id, user_id)
 );
 
+-- Events shared with a user, for the activity feed.
+CREATE INDEX idx_event_permissions_user_event ON event_permissions (user_id, event_id);
+
 
 
 CREATE TABLE event_versions (
@@ -65,6 +103,18 @@ CREATE TABLE event_versions (
     UNIQUE (event_id, version_number)
 );
 
+-- Versions written by PATCH store only the fields in changed_fields (the
+-- other columns are NULL); every Nth version is a full snapshot so any
+-- version is rebuilt from a bounded chain of deltas.
+ALTER TABLE event_versions ADD COLUMN is_snapshot BOOLEAN NOT NULL DEFAULT TRUE;
+ALTER TABLE event_versions ADD COLUMN changed_fields TEXT[];
+
+-- Start events.version at the newest recorded version for existing events.
+UPDATE events e
+SET version = v.latest
+FROM (SELECT event_id, MAX(version_number) AS latest FROM event_versions GROUP BY event_id) v
+WHERE v.event_id = e.id;
+
 CREATE TABLE event_changelog (
     id SERIAL PRIMARY KEY,
     event_id INTEGER NOT NULL REFERENCES events(id) ON DELETE CASCADE,
@@ -74,6 +124,37 @@ CREATE TABLE event_changelog (
     created_at TIMESTAMP DEFAULT NOW()
 );
 
+-- Serves per-event changelog pages newest first, and the per-event legs of
+-- the activity feed.
+CREATE INDEX idx_event_changelog_event_created_id ON event_changelog (event_id, created_at DESC, id DESC);
+
+-- Number of changelog entries per event, kept by the statement that inserts
+-- them so it becomes visible exactly when they do. The changelog ETag reads
+-- this one row instead of scanning the event's history.
+CREATE TABLE event_changelog_heads (
+    event_id INTEGER PRIMARY KEY REFERENCES events(id) ON DELETE CASCADE,
+    entries BIGINT NOT NULL
+);
+
+CREATE OR REPLACE FUNCTION count_changelog_entries() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO event_changelog_heads (event_id, entries)
+    SELECT event_id, COUNT(*) FROM added GROUP BY event_id
+    ON CONFLICT (event_id) DO UPDATE
+    SET entries = event_changelog_heads.entries + EXCLUDED.entries;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER event_changelog_count
+AFTER INSERT ON event_changelog
+REFERENCING NEW TABLE AS added
+FOR EACH STATEMENT EXECUTE FUNCTION count_changelog_entries();
+
+INSERT INTO event_changelog_heads (event_id, entries)
+SELECT event_id, COUNT(*) FROM event_changelog GROUP BY event_id
+ON CONFLICT (event_id) DO UPDATE SET entries = EXCLUDED.entries;
+
 CREATE TABLE event_version_diffs (
     id SERIAL PRIMARY KEY,
     event_id INTEGER NOT NULL REFERENCES events(id) ON DELETE CASCADE,
@@ -84,20 +165,98 @@ CREATE TABLE event_version_diffs (
 
 
 
-CREATE OR REPLACE FUNCTION rollback_event_to_version(event_id INT, version_id INT)
-RETURNS void AS $$
+-- Rolls an event back to an earlier version in one statement: rebuilds the
+-- target from its snapshot chain, writes it to events, and appends a new
+-- snapshot version, changelog and diff row. The event row is locked first,
+-- so concurrent rollbacks and edits serialise. Returns the new version
+-- number, or NULL if the event or target version does not exist.
+DROP FUNCTION IF EXISTS rollback_event_to_version(INT, INT);
+
+CREATE OR REPLACE FUNCTION rollback_event_to_version(p_event_id INT, p_version_number INT, p_user_id INT)
+RETURNS INT AS $$
 DECLARE
-    version_record event_versions%ROWTYPE;
+    step event_versions%ROWTYPE;
+    found_version INT;
+    new_version INT;
+    v_title TEXT;
+    v_description TEXT;
+    v_start_time TIMESTAMP;
+    v_end_time TIMESTAMP;
+    v_recurrence_rule TEXT;
 BEGIN
-    SELECT * INTO version_record
-    FROM event_versions
-    WHERE event_id = event_id AND id = version_id;
+    PERFORM 1 FROM events WHERE id = p_event_id FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN NULL;
+    END IF;
+
+    FOR step IN
+        SELECT * FROM event_versions
+        WHERE event_id = p_event_id AND version_number <= p_version_number
+          AND version_number >= (
+              SELECT MAX(version_number) FROM event_versions
+              WHERE event_id = p_event_id AND version_number <= p_version_number AND is_snapshot
+          )
+        ORDER BY version_number
+    LOOP
+        IF step.is_snapshot OR 'title' = ANY(step.changed_fields) THEN
+            v_title := step.title;
+        END IF;
+        IF step.is_snapshot OR 'description' = ANY(step.changed_fields) THEN
+            v_description := step.description;
+        END IF;
+        IF step.is_snapshot OR 'start_time' = ANY(step.changed_fields) THEN
+            v_start_time := step.start_time;
+        END IF;
+        IF step.is_snapshot OR 'end_time' = ANY(step.changed_fields) THEN
+            v_end_time := step.end_time;
+        END IF;
+        IF step.is_snapshot OR 'recurrence_rule' = ANY(step.changed_fields) THEN
+            v_recurrence_rule := step.recurrence_rule;
+        END IF;
+        found_version := step.version_number;
+    END LOOP;
+
+    IF found_version IS DISTINCT FROM p_version_number THEN
+        RETURN NULL;
+    END IF;
 
     UPDATE events
-    SET title = version_record.title,
-        description = version_record.description,
-        start_time = version_record.start_time,
-        end_time = version_record.end_time,
-        recurrence_rule = version_record.recurrence_rule
-    WHERE id = event_id;
+    SET title = v_title,
+        description = v_description,
+        start_time = v_start_time,
+        end_time = v_end_time,
+        recurrence_rule = v_recurrence_rule,
+        recurrence_end = NULL,
+        version = version + 1
+    WHERE id = p_event_id
+    RETURNING version INTO new_version;
+
+    INSERT INTO event_versions (
+        event_id, version_number, title, description, start_time, end_time,
+        recurrence_rule, is_snapshot, updated_by, change_summary
+    ) VALUES (
+        p_event_id, new_version, v_title, v_description, v_start_time, v_end_time,
+        v_recurrence_rule, TRUE, p_user_id, 'Rolled back to version ' || p_version_number
+    );
+
+    INSERT INTO event_changelog (event_id, action, user_id, description)
+    VALUES (p_event_id, 'update', p_user_id, 'Rolled back to version ' || p_version_number);
+
+    INSERT INTO event_version_diffs (event_id, version_number, diff_summary)
+    VALUES (p_event_id, new_version, 'Rolled back to version ' || p_version_number);
+
+    RETURN new_version;
+END;
 $$ LANGUAGE plpgsql;
+
+
+-- JTIs of logged-out tokens, shared between workers; rows are useless once
+-- expires_at has passed and can be deleted.
+CREATE TABLE revoked_tokens (
+    id BIGSERIAL PRIMARY KEY,
+    jti TEXT UNIQUE NOT NULL,
+    expires_at TIMESTAMP NOT NULL,
+    revoked_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX idx_revoked_tokens_revoked_at ON revoked_tokens (revoked_at);
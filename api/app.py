@@ -1,4 +1,4 @@
-from flask import Flask
+from flask import Flask, Response
 from flask_jwt_extended import JWTManager
 from flasgger import Swagger
 
@@ -6,8 +6,15 @@ from controllers.login_controller import auth
 from controllers.events_controller import events
 from controllers.collaborative_controller import collaboration
 from controllers.versionhistory_controller import version_history
+from controllers.role_controller import role_cache
+from utils.rds_helper import RDSHelper, attach_write_pin, release_request_connection
+from utils.row_encoder import FastJSONProvider
+from utils.revocation import revoked_tokens
+from utils.event_cache import event_cache
+from utils.audit import audit_log
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 
 app.config["JWT_SECRET_KEY"] = "your-secret-key"
 app.config['SWAGGER'] = {
@@ -18,13 +25,27 @@ app.config['SWAGGER'] = {
 swagger = Swagger(app)
 jwt = JWTManager(app)
 
+
+@jwt.token_in_blocklist_loader
+def is_token_revoked(jwt_header, jwt_payload):
+    return revoked_tokens.is_revoked(jwt_payload["jti"])
+
+
 app.register_blueprint(auth)
 app.register_blueprint(events)
 app.register_blueprint(collaboration)
 app.register_blueprint(version_history)
 
+app.after_request(attach_write_pin)
+app.teardown_appcontext(release_request_connection)
+
 @app.route("/")
 def home():
     return {"message": "Hello from Collaborative-Event-Management-System API Documentation with Swagger! Kindly please append '/apidocs' under the base URL above to access the documentation."}
 
 
+@app.route("/metrics")
+def metrics():
+    cache_stats = {"event": event_cache.stats(), "role": role_cache.stats()}
+    body = RDSHelper.render_metrics(cache_stats, audit_log.stats(), audit_log.flush_latency())
+    return Response(body, mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,69 @@
+"""Login throughput (password verifications/sec) at a fixed CPU budget.
+
+Needs no database; it drives the same PasswordHasher the login endpoint
+uses from many concurrent "request" threads and reports logins/sec, p95
+latency and how many requests were shed with 503:
+
+    python -m benchmarks.bench_login [cpus] [client_threads] [seconds]
+"""
+import os
+import sys
+import time
+import threading
+
+from utils.passwords import PasswordHasher, PasswordHasherBusy, legacy_sha256
+
+
+def main():
+    cpus = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 5.0
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, set(sorted(os.sched_getaffinity(0))[:cpus]))
+
+    hasher = PasswordHasher(workers=cpus, queue_limit=cpus * 4)
+    stored = hasher.hash("correct horse battery staple")
+    latencies = []
+    shed = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def client():
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                ok, _ = hasher.verify("correct horse battery staple", stored)
+                assert ok
+            except PasswordHasherBusy:
+                with lock:
+                    shed[0] += 1
+                time.sleep(0.01)
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95)] if latencies else 0.0
+    legacy_rate = 100000 / timeit_legacy()
+    print(f"cpus / clients:    {cpus} / {clients}")
+    print(f"scrypt logins/s:   {len(latencies) / seconds:.1f}")
+    print(f"p95 latency:       {p95 * 1000:.1f} ms")
+    print(f"shed (503):        {shed[0]}")
+    print(f"legacy sha256/s:   {legacy_rate:.0f} (for reference)")
+
+
+def timeit_legacy():
+    started = time.perf_counter()
+    for _ in range(100000):
+        legacy_sha256("correct horse battery staple")
+    return time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Per-request RDSHelper overhead, before and after lazy health checks.
+
+Run from the repository root against the database in utils/config.py:
+
+    python -m benchmarks.bench_rds_helper [iterations]
+"""
+import sys
+import time
+
+import boto3
+
+from utils.config import Config
+from utils.connection import Connection
+from utils.rds_helper import RDSHelper
+
+
+def legacy_request(pool):
+    # What every RDSHelper() used to do: probe with SELECT 1 and build a
+    # fresh boto3 client, followed by the handler's actual query.
+    conn = pool.getconn()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1;")
+        cursor.fetchall()
+        boto3.client('rds', region_name='us-east-1')
+        cursor.execute("SELECT 1;")
+        cursor.fetchall()
+        cursor.close()
+    finally:
+        pool.putconn(conn)
+
+
+def current_request(pool):
+    with RDSHelper(config=pool.config) as db:
+        db.execute_query("SELECT 1;")
+
+
+def run(fn, pool, iterations):
+    fn(pool)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn(pool)
+    return (time.perf_counter() - started) / iterations
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    pool = Connection.getInstance(Config())
+    legacy = run(legacy_request, pool, iterations)
+    current = run(current_request, pool, iterations)
+    print(f"iterations:        {iterations}")
+    print(f"legacy per-call:   {legacy * 1000:.3f} ms")
+    print(f"current per-call:  {current * 1000:.3f} ms")
+    print(f"speedup:           {legacy / current:.1f}x")
+    print(f"pool:              {pool.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Latency of a role-protected endpoint with and without the role cache.
+
+Run from the repository root against the database in utils/config.py,
+passing the id of an existing Owner/Editor user:
+
+    python -m benchmarks.bench_role_check <user_id> [iterations]
+"""
+import sys
+import time
+
+from flask_jwt_extended import create_access_token, jwt_required
+
+from api.app import app
+from controllers.role_controller import role_cache, role_required
+
+
+@app.route("/__bench/protected")
+@jwt_required()
+@role_required(["Owner", "Editor"])
+def protected():
+    return "", 204
+
+
+def run(client, headers, iterations, cold):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        if cold:
+            role_cache.clear()
+        response = client.get("/__bench/protected", headers=headers)
+        assert response.status_code == 204, response.status_code
+    return (time.perf_counter() - started) / iterations
+
+
+def main():
+    user_id = sys.argv[1]
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    with app.app_context():
+        token = create_access_token(identity=str(user_id))
+    headers = {"Authorization": f"Bearer {token}"}
+    client = app.test_client()
+    run(client, headers, 10, cold=True)
+    uncached = run(client, headers, iterations, cold=True)
+    cached = run(client, headers, iterations, cold=False)
+    print(f"iterations:        {iterations}")
+    print(f"DB role lookup:    {uncached * 1000:.3f} ms/request")
+    print(f"cached role:       {cached * 1000:.3f} ms/request")
+    print(f"role cache:        {role_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
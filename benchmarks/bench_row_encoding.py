@@ -0,0 +1,68 @@
+"""Row-to-JSON encoding: dict(zip()) + jsonify vs. the RowSet fast path.
+
+Needs no database; rows are synthesised to look like ``SELECT * FROM events``:
+
+    python -m benchmarks.bench_row_encoding [rows] [repeats]
+"""
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+from flask import Flask
+
+from utils.row_encoder import EncoderCache, FastJSONProvider, RowSet
+
+DESCRIPTION = [(name,) for name in (
+    "id", "title", "description", "user_id", "start_time", "end_time",
+    "created_at", "recurrence_rule",
+)]
+SQL = "SELECT * FROM events WHERE user_id = %s LIMIT %s OFFSET %s"
+
+
+def make_rows(count):
+    base = datetime(2025, 1, 1, 9, 0)
+    return [
+        (
+            i, f"Event {i}", "Weekly sync with the team", 42,
+            base + timedelta(hours=i), base + timedelta(hours=i, minutes=30),
+            base, "FREQ=WEEKLY;BYDAY=MO" if i % 3 == 0 else None,
+        )
+        for i in range(count)
+    ]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    rows = make_rows(count)
+    cache = EncoderCache()
+
+    legacy_app = Flask("legacy")
+    fast_app = Flask("fast")
+    fast_app.json = FastJSONProvider(fast_app)
+
+    def legacy():
+        column_names = [col[0] for col in DESCRIPTION]
+        result = [dict(zip(column_names, row)) for row in rows]
+        return legacy_app.json.response(result).get_data()
+
+    def fast():
+        result = RowSet(cache.get(SQL, DESCRIPTION), rows)
+        return fast_app.json.response(result).get_data()
+
+    with legacy_app.app_context():
+        legacy_body = legacy()
+        legacy_time = min(timeit.repeat(legacy, number=repeats, repeat=5)) / repeats
+    with fast_app.app_context():
+        fast_body = fast()
+        fast_time = min(timeit.repeat(fast, number=repeats, repeat=5)) / repeats
+
+    print(f"rows:              {count}")
+    print(f"identical output:  {legacy_body == fast_body}")
+    print(f"dict + jsonify:    {legacy_time * 1000:.3f} ms")
+    print(f"RowSet:            {fast_time * 1000:.3f} ms")
+    print(f"speedup:           {legacy_time / fast_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from utils.rds_helper import RDSHelper
+from utils.json_stream import json_stream_response
 
 collaboration = Blueprint('collaboration', __name__,url_prefix="/api/events")
 
@@ -70,8 +71,8 @@ def list_permissions(event_id):
         description: Event not found
     """
     db = RDSHelper()
-    permissions = db.execute_query("SELECT * FROM event_permissions WHERE event_id = %s", (event_id,))
-    return jsonify(permissions), 200
+    permissions = db.execute_query_iter("SELECT * FROM event_permissions WHERE event_id = %s", (event_id,))
+    return json_stream_response(permissions)
 
 
 @collaboration.route("/<int:event_id>/permissions/<int:user_id>", methods=["PUT"])
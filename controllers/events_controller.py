@@ -1,7 +1,21 @@
-from flask import Blueprint, request, jsonify
+import time
+from datetime import datetime
+import psycopg2
+from flask import Blueprint, Response, current_app, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from utils.rds_helper import RDSHelper
 from controllers.role_controller import role_required
+from utils.bulk_events import EVENT_FIELDS, bulk_create_events, copy_import_chunk, validate_events
+from utils.copy_stream import iter_csv, iter_lines, iter_ndjson, stream_copy_out
+from utils.json_stream import json_stream_response
+from utils.pagination import decode_cursor, encode_cursor
+from utils.row_encoder import RowSet
+from utils.recurrence import expand_occurrences, recurrence_end, to_naive_utc
+from utils.conflicts import find_conflicts, parse_slot
+from utils.etags import etag_matches, event_etag, if_match_version, not_modified, tag
+from utils.event_cache import event_cache
+from utils.versions import is_snapshot_version, version_row
+from utils.audit import audit_log
 
 
 
@@ -9,6 +23,69 @@ from controllers.role_controller import role_required
 events = Blueprint("events", __name__, url_prefix="/api/events")
 
 
+def current_version(db, event_id):
+    """Current version number of an event (0 if it does not exist), read
+    without fetching or serialising the rest of the row."""
+    rows = db.execute_query("SELECT version FROM events WHERE id = %s", (event_id,), prepare=True)
+    return rows[0]["version"] if rows else 0
+
+
+def _expected_version(data, event_id):
+    """Version the client based its edit on, from the body or If-Match."""
+    expected = data.get("expected_version")
+    return int(expected) if expected is not None else if_match_version(event_id)
+
+
+def _not_applied(tx, event_id):
+    """Response for an UPDATE ... WHERE version = expected that hit no row."""
+    current = tx.query("SELECT version FROM events WHERE id = %s", (event_id,), prepare=True)
+    if not current:
+        return jsonify({"error": "Event not found"}), 404
+    return jsonify({
+        "error": "Event was modified by someone else",
+        "current_version": current[0]["version"],
+    }), 409
+
+
+def _record_version(tx, event_id, version_number, user_id, values, changed, summary):
+    """Queue the version row of an update and hand its changelog and diff
+    rows to the audit log. ``changed`` is None for a full replacement, which
+    is always stored as a snapshot; otherwise only the changed fields are
+    stored, except on the periodic snapshot versions."""
+    snapshot = changed is None or is_snapshot_version(version_number, tx.helper.config.version_snapshot_interval)
+    row = version_row(event_id, version_number, values, changed, snapshot)
+    tx.defer(
+        """
+        INSERT INTO event_versions (
+            event_id, version_number, title, description, start_time, end_time,
+            recurrence_rule, changed_fields, is_snapshot, updated_by, change_summary
+        ) VALUES (
+            %(event_id)s, %(version_number)s, %(title)s, %(description)s, %(start_time)s, %(end_time)s,
+            %(recurrence_rule)s, %(changed_fields)s, %(is_snapshot)s, %(updated_by)s, %(change_summary)s
+        )
+        """,
+        {**row, "updated_by": user_id, "change_summary": summary},
+    )
+    audit_log.record(
+        tx,
+        (event_id, "update", user_id, "Updated event"),
+        (event_id, version_number, "Updated " + "/".join(changed or EVENT_FIELDS)),
+    )
+
+
+def _conflicts_or_none(tx, user_id, slot, exclude_event_id=None):
+    """Run the optional conflict check inside a write transaction. The
+    per-user advisory lock serialises concurrent checked writes, so two
+    requests cannot both see a free slot and both take it."""
+    tx.execute("SELECT pg_advisory_xact_lock(hashtext('events.conflicts'), %s)", (user_id,))
+    (conflicts,), _ = find_conflicts(
+        tx.query, user_id, [slot], exclude_event_id, tx.helper.config.occurrences_max
+    )
+    if conflicts:
+        return jsonify({"error": "Event conflicts with existing events", "conflicts": conflicts}), 409
+    return None
+
+
 @events.route("/", methods=["POST"])
 @jwt_required()
 @role_required(["Owner", "Editor"])
@@ -40,62 +117,70 @@ def create_event():
               format: date-time
             recurrence_rule:
               type: string
+            check_conflicts:
+              type: boolean
+              description: Reject the event with 409 if its first occurrence overlaps an existing event
     responses:
       201:
         description: Event created
       400:
         description: Missing required fields
+      409:
+        description: Event conflicts with existing events
     """
     data = request.get_json()
     required_fields = ["title", "start_time"]
     if not all(data.get(field) for field in required_fields):
         return jsonify({"error": "Title and start_time are required"}), 400
 
+    slot = None
+    if data.get("check_conflicts"):
+        try:
+            slot = parse_slot(data.get("start_time"), data.get("end_time"))
+        except (AttributeError, TypeError, ValueError):
+            return jsonify({"error": "start_time and end_time must be ISO 8601 date-times"}), 400
+
     user_id = int(get_jwt_identity())
     db = RDSHelper()
     insert_sql = """
-        INSERT INTO events (title, description, user_id, start_time, end_time, recurrence_rule)
-        VALUES (%s, %s, %s, %s, %s, %s) RETURNING id
+        INSERT INTO events (title, description, user_id, start_time, end_time, recurrence_rule, recurrence_end)
+        VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id
     """
-    event_id = db.execute_command_returning_id(
-        insert_sql,
-        (
-            data.get("title"),
-            data.get("description"),
-            user_id,
-            data.get("start_time"),
-            data.get("end_time"),
-            data.get("recurrence_rule"),
-        ),
-    )
-    db.execute_command(
-        """
-        INSERT INTO event_versions (
-            event_id, version_number, title, description, start_time, end_time,
-            recurrence_rule, updated_by, change_summary
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """,
-        (
-            event_id, 1, data.get("title"), data.get("description"),
-            data.get("start_time"), data.get("end_time"), data.get("recurrence_rule"),
-            user_id, "Initial event creation"
+    with db.transaction() as tx:
+        if slot is not None:
+            conflict = _conflicts_or_none(tx, user_id, slot)
+            if conflict is not None:
+                return conflict
+        event_id = tx.execute_returning_id(
+            insert_sql,
+            (
+                data.get("title"),
+                data.get("description"),
+                user_id,
+                data.get("start_time"),
+                data.get("end_time"),
+                data.get("recurrence_rule"),
+                recurrence_end(data.get("recurrence_rule"), data.get("start_time"), data.get("end_time")),
+            ),
+        )
+        tx.defer(
+            """
+            INSERT INTO event_versions (
+                event_id, version_number, title, description, start_time, end_time,
+                recurrence_rule, updated_by, change_summary
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """,
+            (
+                event_id, 1, data.get("title"), data.get("description"),
+                data.get("start_time"), data.get("end_time"), data.get("recurrence_rule"),
+                user_id, "Initial event creation"
+            )
+        )
+        audit_log.record(
+            tx,
+            (event_id, "create", user_id, "Created event"),
+            (event_id, 1, "Initial version created"),
         )
-    )
-
-    db.execute_command(
-        """
-        INSERT INTO event_changelog (event_id, action, user_id, description)
-        VALUES (%s, %s, %s, %s)
-        """,
-        (event_id, "create", user_id, "Created event")
-    )
-    db.execute_command(
-        """
-        INSERT INTO event_version_diffs (event_id, version_number, diff_summary)
-        VALUES (%s, %s, %s)
-        """,
-        (event_id, 1, "Initial version created")
-    )
 
     return jsonify({"event_id": event_id, "message": "Event created"}), 201
 
@@ -122,6 +207,14 @@ def list_events():
         required: false
         default: 0
         description: Number of events to skip before starting to collect the result set
+      - in: query
+        name: cursor
+        type: string
+        required: false
+        description: >
+          Keyset pagination ordered by (start_time, id). Pass an empty value for
+          the first page, then the returned next_cursor. The response becomes
+          {"events": [...], "next_cursor": ...} and limit is capped.
     responses:
       200:
         description: A list of events belonging to the user
@@ -148,16 +241,194 @@ def list_events():
         description: Unauthorized  JWT token is missing or invalid
     """
     user_id = int(get_jwt_identity())
-    limit = int(request.args.get("limit", 10))
-    offset = int(request.args.get("offset", 0))
+    try:
+        limit = int(request.args.get("limit", 10))
+        offset = int(request.args.get("offset", 0))
+    except ValueError:
+        return jsonify({"error": "limit and offset must be integers"}), 400
     db = RDSHelper()
-    events = db.execute_query(
-        "SELECT * FROM events WHERE user_id = %s LIMIT %s OFFSET %s",
-        (user_id, limit, offset),
-    )
+    page_size_max = db.config.page_size_max
+
+    if "cursor" in request.args:
+        limit = max(1, min(limit, page_size_max))
+        token = request.args.get("cursor")
+        if token:
+            try:
+                after_start, after_id = decode_cursor(token, datetime, int)
+            except ValueError:
+                return jsonify({"error": "Invalid cursor"}), 400
+            events = db.execute_query_rows(
+                """
+                SELECT * FROM events
+                WHERE user_id = %s AND (start_time, id) > (%s::timestamp, %s)
+                ORDER BY start_time, id LIMIT %s
+                """,
+                (user_id, after_start, after_id, limit + 1),
+                prepare=True,
+            )
+        else:
+            events = db.execute_query_rows(
+                "SELECT * FROM events WHERE user_id = %s ORDER BY start_time, id LIMIT %s",
+                (user_id, limit + 1),
+                prepare=True,
+            )
+        next_cursor = None
+        if len(events) > limit:
+            events = RowSet(events.encoder, events.rows[:limit])
+            last = events[limit - 1]
+            next_cursor = encode_cursor(last["start_time"], last["id"])
+        return jsonify({"events": events, "next_cursor": next_cursor}), 200
+
+    sql = "SELECT * FROM events WHERE user_id = %s ORDER BY start_time, id LIMIT %s OFFSET %s"
+    if limit > page_size_max:
+        # Oversized legacy pages are streamed instead of materialised.
+        return json_stream_response(db.execute_query_iter(sql, (user_id, limit, offset)))
+    events = db.execute_query_rows(sql, (user_id, limit, offset), prepare=True)
     return jsonify(events), 200
 
 
+@events.route("/occurrences", methods=["GET"])
+@jwt_required()
+def list_occurrences():
+    """
+    List Event Occurrences in a Time Window
+    ---
+    tags:
+      - Events
+    parameters:
+      - in: query
+        name: from
+        type: string
+        format: date-time
+        required: true
+      - in: query
+        name: to
+        type: string
+        format: date-time
+        required: true
+    responses:
+      200:
+        description: >
+          Occurrences of the user's events (recurring rules expanded) that
+          overlap [from, to), ordered by start time
+      400:
+        description: Missing or invalid window
+    """
+    try:
+        window_start = to_naive_utc(datetime.fromisoformat(request.args["from"]))
+        window_end = to_naive_utc(datetime.fromisoformat(request.args["to"]))
+    except (KeyError, ValueError):
+        return jsonify({"error": "from and to must be ISO 8601 date-times"}), 400
+    if window_end <= window_start:
+        return jsonify({"error": "to must be after from"}), 400
+
+    user_id = int(get_jwt_identity())
+    db = RDSHelper()
+    # One-off events are matched by period overlap on idx_events_user_period.
+    # Recurring ones must start before the window ends and not have finished
+    # before it (recurrence_end is NULL for open-ended or unanalysed rules),
+    # which idx_events_user_recurrence_end bounds.
+    candidates = db.execute_query(
+        """
+        SELECT id, title, start_time, end_time, recurrence_rule FROM events
+        WHERE user_id = %s AND recurrence_rule IS NULL
+          AND event_period(start_time, end_time) && tsrange(%s, %s, '[)')
+        UNION ALL
+        SELECT id, title, start_time, end_time, recurrence_rule FROM events
+        WHERE user_id = %s AND recurrence_rule IS NOT NULL AND start_time < %s
+          AND (recurrence_end IS NULL OR recurrence_end >= %s)
+        """,
+        (user_id, window_start, window_end, user_id, window_end, window_start),
+        prepare=True,
+    )
+    occurrences, truncated = expand_occurrences(
+        candidates, window_start, window_end, db.config.occurrences_max
+    )
+    return jsonify({"occurrences": occurrences, "truncated": truncated}), 200
+
+
+@events.route("/conflicts", methods=["GET", "POST"])
+@jwt_required()
+def check_conflicts():
+    """
+    Check Time Slots for Conflicts
+    ---
+    tags:
+      - Events
+    parameters:
+      - in: query
+        name: start_time
+        type: string
+        format: date-time
+        description: Slot start (GET)
+      - in: query
+        name: end_time
+        type: string
+        format: date-time
+        description: Slot end (GET); omit for a single instant
+      - in: query
+        name: exclude_event_id
+        type: integer
+        description: Ignore this event, e.g. the one being rescheduled
+      - in: body
+        name: body
+        required: false
+        schema:
+          id: ConflictCheck
+          properties:
+            slots:
+              type: array
+              items:
+                type: object
+                properties:
+                  start_time:
+                    type: string
+                    format: date-time
+                  end_time:
+                    type: string
+                    format: date-time
+            exclude_event_id:
+              type: integer
+    responses:
+      200:
+        description: >
+          Events (including occurrences of recurring events) overlapping each
+          slot. GET returns {"conflicts": [...]}, POST returns {"slots": [...]}
+          in request order; truncated is set if recurring expansion was capped.
+      400:
+        description: Missing or invalid slot
+    """
+    data = request.get_json(silent=True) if request.method == "POST" else None
+    source = data if data is not None else request.args
+    raw_slots = source.get("slots") if data is not None else [request.args]
+    if not isinstance(raw_slots, list) or not raw_slots:
+        return jsonify({"error": "slots must be a non-empty list"}), 400
+
+    db = RDSHelper()
+    if len(raw_slots) > db.config.conflict_slots_max:
+        return jsonify({"error": f"At most {db.config.conflict_slots_max} slots per request"}), 400
+    try:
+        slots = [parse_slot(slot.get("start_time"), slot.get("end_time")) for slot in raw_slots]
+        exclude_event_id = source.get("exclude_event_id")
+        exclude_event_id = int(exclude_event_id) if exclude_event_id is not None else None
+    except (AttributeError, TypeError, ValueError):
+        return jsonify({"error": "start_time and end_time must be ISO 8601 date-times"}), 400
+
+    user_id = int(get_jwt_identity())
+    conflicts, truncated = find_conflicts(
+        db.execute_query, user_id, slots, exclude_event_id, db.config.occurrences_max
+    )
+    if request.method == "GET":
+        return jsonify({"conflicts": conflicts[0], "truncated": truncated}), 200
+    return jsonify({
+        "slots": [
+            {"start_time": start, "end_time": end, "conflicts": found}
+            for (start, end), found in zip(slots, conflicts)
+        ],
+        "truncated": truncated,
+    }), 200
+
+
 @events.route("/<int:event_id>", methods=["GET"])
 @jwt_required()
 def get_event(event_id):
@@ -171,17 +442,35 @@ def get_event(event_id):
         in: path
         type: integer
         required: true
+      - name: If-None-Match
+        in: header
+        type: string
+        required: false
     responses:
       200:
-        description: Event details
+        description: Event details, with an ETag naming the event's current version
+      304:
+        description: The client's copy (If-None-Match) is still current
       404:
         description: Event not found
     """
     db = RDSHelper()
-    event = db.execute_query("SELECT * FROM events WHERE id = %s", (event_id,))
-    if not event:
-        return jsonify({"error": "Event not found"}), 404
-    return jsonify(event[0]), 200
+    # The version is read before the row, so a concurrent update can only
+    # make the ETag (and cache entry) older than the body; the next read
+    # then misses and refetches. Reads after the caller's own write are
+    # pinned to the primary, so they always see the new version.
+    version = current_version(db, event_id)
+    etag = event_etag(event_id, version)
+    if etag_matches(etag):
+        return not_modified(etag)
+    payload = event_cache.get(event_id, version)
+    if payload is None:
+        event = db.execute_query_rows("SELECT * FROM events WHERE id = %s", (event_id,), prepare=True)
+        if not event:
+            return jsonify({"error": "Event not found"}), 404
+        payload = jsonify(event.first()).get_data()
+        event_cache.set(event_id, version, payload)
+    return tag(current_app.response_class(payload, mimetype="application/json"), etag)
 
 
 @events.route("/<int:event_id>", methods=["PUT"])
@@ -216,66 +505,182 @@ def update_event(event_id):
               format: date-time
             recurrence_rule:
               type: string
+            check_conflicts:
+              type: boolean
+              description: Reject the update with 409 if the new time overlaps another of the owner's events
+            expected_version:
+              type: integer
+              description: Apply the update only if the event is still at this version
+      - name: If-Match
+        in: header
+        type: string
+        required: false
+        description: ETag from GET /api/events/{event_id}; same effect as expected_version
     responses:
       200:
-        description: Event updated
+        description: Event updated; the body and ETag carry the new version
+      400:
+        description: Malformed expected_version or If-Match
       404:
         description: Event not found
+      409:
+        description: >
+          Event conflicts with existing events, or it was modified since
+          expected_version (current_version is returned)
     """
     data = request.get_json()
+    try:
+        expected_version = _expected_version(data, event_id)
+    except (TypeError, ValueError):
+        return jsonify({"error": "expected_version / If-Match must name a version of this event"}), 400
+
+    slot = None
+    if data.get("check_conflicts"):
+        try:
+            slot = parse_slot(data.get("start_time"), data.get("end_time"))
+        except (AttributeError, TypeError, ValueError):
+            return jsonify({"error": "start_time and end_time must be ISO 8601 date-times"}), 400
+
     db = RDSHelper()
     user_id = int(get_jwt_identity())
-    version_info = db.execute_query(
-        "SELECT COALESCE(MAX(version_number), 0) AS version FROM event_versions WHERE event_id = %s",
-        (event_id,)
-    )
-    new_version = version_info[0]["version"] + 1
-   
-    db.execute_command(
-        """
-        UPDATE events
-        SET title=%s, description=%s, start_time=%s, end_time=%s, recurrence_rule=%s
-        WHERE id=%s
-        """,
-        (
-            data.get("title"),
-            data.get("description"),
-            data.get("start_time"),
-            data.get("end_time"),
-            data.get("recurrence_rule"),
-            event_id,
-        ),
-    )
-    db.execute_command(
-        """
-        INSERT INTO event_versions (
-            event_id, version_number, title, description, start_time, end_time,
-            recurrence_rule, updated_by, change_summary
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """,
-        (
-            event_id, new_version, data.get("title"), data.get("description"),
-            data.get("start_time"), data.get("end_time"), data.get("recurrence_rule"),
-            user_id, "Event updated"
+    with db.transaction() as tx:
+        if slot is not None:
+            owner = tx.query("SELECT user_id FROM events WHERE id = %s FOR UPDATE", (event_id,))
+            if not owner:
+                return jsonify({"error": "Event not found"}), 404
+            conflict = _conflicts_or_none(tx, owner[0]["user_id"], slot, exclude_event_id=event_id)
+            if conflict is not None:
+                return conflict
+        # Bumping the counter in the UPDATE itself serialises concurrent
+        # editors on the row lock and hands each one a distinct version.
+        updated = tx.query(
+            """
+            UPDATE events
+            SET title=%s, description=%s, start_time=%s, end_time=%s, recurrence_rule=%s,
+                recurrence_end=%s, version = version + 1
+            WHERE id=%s AND (%s::int IS NULL OR version = %s)
+            RETURNING version
+            """,
+            (
+                data.get("title"),
+                data.get("description"),
+                data.get("start_time"),
+                data.get("end_time"),
+                data.get("recurrence_rule"),
+                recurrence_end(data.get("recurrence_rule"), data.get("start_time"), data.get("end_time")),
+                event_id,
+                expected_version,
+                expected_version,
+            ),
+            prepare=True,
         )
-    )
-    db.execute_command(
-        """
-        INSERT INTO event_changelog (event_id, action, user_id, description)
-        VALUES (%s, %s, %s, %s)
-        """,
-        (event_id, "update", user_id, "Updated event")
-    )
+        if not updated:
+            return _not_applied(tx, event_id)
+        new_version = updated[0]["version"]
+        _record_version(tx, event_id, new_version, user_id, data, None, "Event updated")
 
-    db.execute_command(
-        """
-        INSERT INTO event_version_diffs (event_id, version_number, diff_summary)
-        VALUES (%s, %s, %s)
-        """,
-        (event_id, new_version, "Updated title/description/start_time/etc.")
-    )
+    event_cache.invalidate(event_id)
+    response = jsonify({"message": "Event updated", "version": new_version})
+    response.set_etag(event_etag(event_id, new_version))
+    return response, 200
+
+
+@events.route("/<int:event_id>", methods=["PATCH"])
+@jwt_required()
+@role_required(["Owner", "Editor"])
+def patch_event(event_id):
+    """
+    Partially Update Event
+    ---
+    tags:
+      - Events
+    parameters:
+      - name: event_id
+        in: path
+        type: integer
+        required: true
+      - in: body
+        name: body
+        required: true
+        schema:
+          id: PatchEvent
+          description: Only the supplied fields are changed; omitted fields keep their value
+          properties:
+            title:
+              type: string
+            description:
+              type: string
+            start_time:
+              type: string
+              format: date-time
+            end_time:
+              type: string
+              format: date-time
+            recurrence_rule:
+              type: string
+            expected_version:
+              type: integer
+              description: Apply the update only if the event is still at this version
+      - name: If-Match
+        in: header
+        type: string
+        required: false
+        description: ETag from GET /api/events/{event_id}; same effect as expected_version
+    responses:
+      200:
+        description: Event updated; the body and ETag carry the new version
+      400:
+        description: No updatable fields, a required field set to null, or malformed expected_version
+      404:
+        description: Event not found
+      409:
+        description: Event was modified since expected_version (current_version is returned)
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Body must be a JSON object"}), 400
+    changes = {field: data[field] for field in EVENT_FIELDS if field in data}
+    if not changes:
+        return jsonify({"error": f"Supply at least one of {', '.join(EVENT_FIELDS)}"}), 400
+    if any(field in changes and not changes[field] for field in ("title", "start_time")):
+        return jsonify({"error": "title and start_time cannot be cleared"}), 400
+    try:
+        expected_version = _expected_version(data, event_id)
+    except (TypeError, ValueError):
+        return jsonify({"error": "expected_version / If-Match must name a version of this event"}), 400
+
+    db = RDSHelper()
+    user_id = int(get_jwt_identity())
+    # Column names come from EVENT_FIELDS, never from the request.
+    assignments = ", ".join(f"{field} = %s" for field in changes)
+    with db.transaction() as tx:
+        updated = tx.query(
+            f"""
+            UPDATE events SET {assignments}, version = version + 1
+            WHERE id = %s AND (%s::int IS NULL OR version = %s)
+            RETURNING version, {", ".join(EVENT_FIELDS)}
+            """,
+            (*changes.values(), event_id, expected_version, expected_version),
+            prepare=True,
+        )
+        if not updated:
+            return _not_applied(tx, event_id)
+        new_version = updated[0]["version"]
+        if changes.keys() & {"start_time", "end_time", "recurrence_rule"}:
+            event = updated[0]
+            tx.defer(
+                "UPDATE events SET recurrence_end = %s WHERE id = %s",
+                (recurrence_end(event["recurrence_rule"], event["start_time"], event["end_time"]), event_id),
+            )
+        _record_version(
+            tx, event_id, new_version, user_id, updated[0], list(changes),
+            "Event patched: " + ", ".join(changes),
+        )
 
-    return jsonify({"message": "Event updated"}), 200
+    event_cache.invalidate(event_id)
+    response = jsonify({"message": "Event updated", "version": new_version})
+    response.set_etag(event_etag(event_id, new_version))
+    return response, 200
 
 
 
@@ -335,25 +740,156 @@ def create_batch_events():
         description: Forbidden – User does not have the required role
     """
     data = request.get_json()
+    batch = data.get("events") if data else None
+    if not isinstance(batch, list) or not batch:
+        return jsonify({"error": "events must be a non-empty list"}), 400
+    invalid = validate_events(batch)
+    if invalid is not None:
+        return jsonify({"error": f"Title and start_time are required (event {invalid})"}), 400
+
     user_id = int(get_jwt_identity())
     db = RDSHelper()
-    created_ids = []
-    print(data,'ppp')
-    for event in data['events']:
-        print(event.values(),'event')
-        event_id = db.execute_command_returning_id(
-            """
-            INSERT INTO events (title, description, user_id, start_time, end_time, recurrence_rule)
-            VALUES (%s, %s, %s, %s, %s, %s) RETURNING id
-            """,
-            (
-                event.get("title"),
-                event.get("description"),
-                user_id,
-                event.get("start_time"),
-                event.get("end_time"),
-                event.get("recurrence_rule"),
-            ),
-        )
-        created_ids.append(event_id)
+    with db.transaction() as tx:
+        created_ids = bulk_create_events(tx, user_id, batch, db.config.bulk_chunk_size)
     return jsonify({"created_event_ids": created_ids}), 201
+
+
+EXPORT_COLUMNS = "id, title, description, user_id, start_time, end_time, recurrence_rule, created_at"
+
+
+@events.route("/export", methods=["GET"])
+@jwt_required()
+def export_events():
+    """
+    Export Events
+    ---
+    tags:
+      - Events
+    parameters:
+      - in: query
+        name: format
+        type: string
+        enum: [ndjson, csv]
+        default: ndjson
+        description: Output format; rows are streamed with chunked transfer encoding
+    responses:
+      200:
+        description: All events of the user, one per line
+      400:
+        description: Unsupported format
+    """
+    user_id = int(get_jwt_identity())
+    fmt = request.args.get("format", "ndjson")
+    select_sql = f"SELECT {EXPORT_COLUMNS} FROM events WHERE user_id = %s ORDER BY id"
+    if fmt == "csv":
+        copy_sql = f"COPY ({select_sql}) TO STDOUT WITH (FORMAT csv, HEADER)"
+        mimetype = "text/csv"
+    elif fmt == "ndjson":
+        # CSV mode with control characters as delimiter and quote emits each
+        # JSON document verbatim; row_to_json escapes them inside strings.
+        copy_sql = (
+            f"COPY (SELECT row_to_json(e) FROM ({select_sql}) e) TO STDOUT "
+            "WITH (FORMAT csv, DELIMITER E'\\x1f', QUOTE E'\\x1e')"
+        )
+        mimetype = "application/x-ndjson"
+    else:
+        return jsonify({"error": "format must be ndjson or csv"}), 400
+    pool = RDSHelper().read_pool()
+    return Response(stream_copy_out(copy_sql, (user_id,), pool=pool), mimetype=mimetype)
+
+
+@events.route("/import", methods=["POST"])
+@jwt_required()
+@role_required(["Owner", "Editor"])
+def import_events():
+    """
+    Import Events
+    ---
+    tags:
+      - Events
+    consumes:
+      - application/x-ndjson
+      - text/csv
+    parameters:
+      - in: query
+        name: format
+        type: string
+        enum: [ndjson, csv]
+        default: ndjson
+      - in: query
+        name: offset
+        type: integer
+        default: 0
+        description: Number of records to skip, to resume a partially applied import
+    responses:
+      200:
+        description: Import summary with next_offset and throughput
+      400:
+        description: >
+          Malformed or invalid record, or bad offset; next_offset points at the
+          first record not imported
+    """
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in ("ndjson", "csv"):
+        return jsonify({"error": "format must be ndjson or csv"}), 400
+    try:
+        offset = int(request.args.get("offset", 0))
+    except ValueError:
+        return jsonify({"error": "offset must be an integer"}), 400
+    if offset < 0:
+        return jsonify({"error": "offset must not be negative"}), 400
+    user_id = int(get_jwt_identity())
+    db = RDSHelper()
+    chunk_size = db.config.bulk_chunk_size
+    lines = iter_lines(request.stream)
+    records = iter_csv(lines) if fmt == "csv" else iter_ndjson(lines)
+
+    started = time.monotonic()
+    imported = 0
+    committed = position = offset
+    chunk = []
+
+    def flush():
+        nonlocal imported, committed
+        with db.transaction() as tx:
+            imported += copy_import_chunk(tx, user_id, chunk)
+        committed = position
+        chunk.clear()
+
+    def summary(**extra):
+        elapsed = max(time.monotonic() - started, 1e-9)
+        return {
+            "imported": imported,
+            "next_offset": committed,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(imported / elapsed, 1),
+            **extra,
+        }
+
+    try:
+        for index, record in enumerate(records):
+            if index < offset:
+                continue
+            if validate_events([record]) is not None:
+                if chunk:
+                    flush()
+                return jsonify(summary(error=f"Title and start_time are required (record {index})")), 400
+            chunk.append(record)
+            position = index + 1
+            if len(chunk) >= chunk_size:
+                flush()
+        if chunk:
+            flush()
+    except ValueError as ex:
+        error = f"Malformed record after offset {position}: {ex}"
+        if chunk:
+            try:
+                flush()
+            except (psycopg2.DataError, psycopg2.IntegrityError) as flush_ex:
+                error = f"Invalid record after offset {committed}: {flush_ex}".strip()
+        return jsonify(summary(error=error)), 400
+    except (psycopg2.DataError, psycopg2.IntegrityError) as ex:
+        # The failed chunk was rolled back; earlier chunks stay committed and
+        # next_offset points at the start of the rejected one.
+        return jsonify(summary(error=f"Invalid record after offset {committed}: {ex}".strip())), 400
+    return jsonify(summary()), 200
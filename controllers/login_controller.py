@@ -1,9 +1,11 @@
 from flask import Blueprint, request, jsonify
 # from flask_jwt_extended import create_access_token
 from utils.rds_helper import RDSHelper
-import hashlib
+from utils.config import Config
+from utils.passwords import PasswordHasher, PasswordHasherBusy
+from utils.revocation import revoked_tokens
 from flask_jwt_extended import (
-    jwt_required, get_jwt_identity,  create_access_token,
+    jwt_required, get_jwt, get_jwt_identity,  create_access_token,
 )
 from flask_jwt_extended import  unset_jwt_cookies
 
@@ -11,9 +13,22 @@ from flask_jwt_extended import  unset_jwt_cookies
 auth = Blueprint("auth", __name__, url_prefix="/api/auth")
 
 
+password_hasher = PasswordHasher(
+    workers=Config.password_hash_workers or None,
+    queue_limit=Config.password_hash_queue_limit,
+)
+
+
 def hash_password(password):
-    """Hash the password using SHA-256."""
-    return hashlib.sha256(password.encode()).hexdigest()
+    """Hash the password with scrypt on the password hashing pool."""
+    return password_hasher.hash(password)
+
+
+@auth.errorhandler(PasswordHasherBusy)
+def hashing_busy(ex):
+    response = jsonify({"error": "Server busy, please retry"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
 
 
 @auth.route("/register", methods=["POST"])
@@ -60,25 +75,41 @@ def register():
     if not username or not email or not password:
         return jsonify({"error": "Missing fields"}), 400
 
+    # Hash before opening the transaction so no pooled connection is held
+    # for the duration of the key derivation.
+    password_hash = hash_password(password)
     db = RDSHelper()
-    
-    # Check if user already exists by email or username
-    existing_user = db.execute_query(
-        "SELECT id FROM users WHERE email = %s OR username = %s",
-        (email, username)
-    )
-    if existing_user:
-        return jsonify({"error": "User already exists"}), 409
-
-    hashed_password = hash_password(password)
-    insert_sql = """
-        INSERT INTO users (username, email, password_hash, role_id)
-        VALUES (%s, %s, %s, %s)
-        RETURNING id
-    """
-    user_id = db.execute_command_returning_id(
-        insert_sql, (username, email, hashed_password, role_id)
-    )
+
+    # Insert and conflict detection in one atomic statement: ON CONFLICT
+    # resolves concurrent signups, and the fallback branch names the field.
+    with db.transaction() as tx:
+        result = tx.query(
+            """
+            WITH inserted AS (
+                INSERT INTO users (username, email, password_hash, role_id)
+                VALUES (%(username)s, %(email)s, %(password_hash)s, %(role_id)s)
+                ON CONFLICT DO NOTHING
+                RETURNING id
+            )
+            SELECT id, NULL AS conflict FROM inserted
+            UNION ALL
+            SELECT NULL, CASE
+                WHEN EXISTS (SELECT 1 FROM users WHERE email = %(email)s) THEN 'email'
+                WHEN EXISTS (SELECT 1 FROM users WHERE username = %(username)s) THEN 'username'
+                ELSE 'username_or_email'
+            END
+            WHERE NOT EXISTS (SELECT 1 FROM inserted)
+            """,
+            {
+                "username": username,
+                "email": email,
+                "password_hash": password_hash,
+                "role_id": role_id,
+            },
+        )
+    if result[0]["conflict"]:
+        return jsonify({"error": "User already exists", "field": result[0]["conflict"]}), 409
+    user_id = result[0]["id"]
 
     token = create_access_token(identity=str(user_id))
     return jsonify({"user_id": user_id, "token": token}), 201
@@ -123,19 +154,39 @@ def login():
         return jsonify({"error": "Missing login fields"}), 400
 
     db = RDSHelper()
-    
-    # Retrieve user by username or email
-    user = db.execute_query(
-        "SELECT * FROM users WHERE username = %s OR email = %s",
-        (identifier, identifier)
-    )
+
+    # Look the identifier up in exactly one unique index; an identifier sent
+    # as "username" that looks like an email falls back to the username index.
+    if data.get("username") and "@" not in identifier:
+        columns = ("username",)
+    elif data.get("username"):
+        columns = ("email", "username")
+    else:
+        columns = ("email",)
+    user = None
+    for column in columns:
+        user = db.execute_query(
+            f"SELECT id, password_hash FROM users WHERE {column} = %s",
+            (identifier,),
+            prepare=True,
+        )
+        if user:
+            break
 
     if not user:
         return jsonify({"error": "User not found"}), 404
 
     user = user[0]
-    if hash_password(password) != user["password_hash"]:
+    matches, needs_rehash = password_hasher.verify(password, user["password_hash"])
+    if not matches:
         return jsonify({"error": "Wrong password"}), 401
+    if needs_rehash:
+        # Upgrade legacy or outdated hashes now that we know the password;
+        # the compare-and-set keeps a concurrent password change intact.
+        db.execute_command(
+            "UPDATE users SET password_hash = %s WHERE id = %s AND password_hash = %s",
+            (hash_password(password), user["id"], user["password_hash"]),
+        )
 
     token = create_access_token(identity=str(user["id"]))
     return jsonify({"user_id": user["id"], "token": token}), 200
@@ -161,10 +212,10 @@ def refresh():
 
 
 @auth.route("/logout", methods=["POST"])
-@jwt_required()
+@jwt_required(verify_type=False)
 def logout():
     """
-    Logout the current user by clearing JWT token cookies
+    Logout the current user by revoking the presented token and clearing JWT cookies
     ---
     tags:
       - Auth
@@ -172,6 +223,8 @@ def logout():
       200:
         description: Logout successful
     """
+    token = get_jwt()
+    revoked_tokens.revoke(token["jti"], token["exp"])
     response = jsonify({"msg": "Logout successful"})
     unset_jwt_cookies(response)
     return response, 200
@@ -1,17 +1,38 @@
 from functools import wraps
 from flask_jwt_extended import get_jwt_identity
 from utils.rds_helper import RDSHelper
+from utils.config import Config
+from utils.ttl_cache import TTLCache
 from flask import jsonify
 
+role_cache = TTLCache(Config.role_cache_size, Config.role_cache_ttl)
+
+
+def get_user_role(user_id):
+    """Resolve a user's role name, hitting the database only on a cache miss."""
+    key = str(user_id)
+    role = role_cache.get(key)
+    if role is None:
+        db = RDSHelper()
+        result = db.execute_query("SELECT r.name FROM users u JOIN roles r ON u.role_id = r.id WHERE u.id = %s", (user_id,), prepare=True)
+        if not result:
+            return None
+        role = result[0]['name']
+        role_cache.set(key, role)
+    return role
+
+
+def invalidate_user_role(user_id):
+    """Drop the cached role of a user; call after changing users.role_id."""
+    role_cache.invalidate(str(user_id))
+
+
 def role_required(allowed_roles):
     def wrapper(fn):
         @wraps(fn)
         def decorator(*args, **kwargs):
             user_id = get_jwt_identity()
-            db = RDSHelper()
-            result = db.execute_query("SELECT r.name FROM users u JOIN roles r ON u.role_id = r.id WHERE u.id = %s", (user_id,))
-            print(result)
-            if not result or result[0]['name'] not in allowed_roles:
+            if get_user_role(user_id) not in allowed_roles:
                 return jsonify({"error": "Unauthorized"}), 403
             return fn(*args, **kwargs)
         return decorator
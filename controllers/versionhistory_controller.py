@@ -1,11 +1,67 @@
+from datetime import datetime
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from utils.rds_helper import RDSHelper
+from utils.json_stream import json_stream_response
+from utils.etags import IMMUTABLE, etag_matches, event_etag, not_modified, tag
+from utils.event_cache import event_cache
+from utils.versions import load_version
+from utils.diffs import successive_diffs, version_diff
+from utils.pagination import decode_cursor, encode_cursor
+from utils.recurrence import to_naive_utc
+from utils.row_encoder import RowSet
 
 
 
 version_history = Blueprint('version_history', __name__,url_prefix="/api/events")
 
+CHANGELOG_ACTIONS = ("create", "update", "delete")
+CHANGELOG_ORDER = "ORDER BY c.created_at DESC, c.id DESC"
+
+
+def _changelog_filters(args):
+    """WHERE clauses and params for the since/until/action/user_id filters
+    and the keyset cursor; raises ValueError on malformed input."""
+    clauses, params = [], []
+    if args.get("since"):
+        clauses.append("c.created_at >= %s")
+        params.append(to_naive_utc(datetime.fromisoformat(args["since"])))
+    if args.get("until"):
+        clauses.append("c.created_at < %s")
+        params.append(to_naive_utc(datetime.fromisoformat(args["until"])))
+    if args.get("action"):
+        if args["action"] not in CHANGELOG_ACTIONS:
+            raise ValueError(f"action must be one of {', '.join(CHANGELOG_ACTIONS)}")
+        clauses.append("c.action = %s")
+        params.append(args["action"])
+    if args.get("user_id"):
+        clauses.append("c.user_id = %s")
+        params.append(int(args["user_id"]))
+    if args.get("cursor"):
+        clauses.append("(c.created_at, c.id) < (%s::timestamp, %s)")
+        params.extend(decode_cursor(args["cursor"], datetime, int))
+    return clauses, params
+
+
+def _page_limit(args, page_size_max):
+    """Page size from ``limit``, clamped to 1..page_size_max; raises
+    ValueError if it is not an integer."""
+    try:
+        limit = int(args.get("limit", 50))
+    except ValueError:
+        raise ValueError("limit must be an integer") from None
+    return max(1, min(limit, page_size_max))
+
+
+def _changelog_page(entries, limit):
+    """Trim a ``limit + 1`` fetch to one page and derive its next cursor."""
+    next_cursor = None
+    if len(entries) > limit:
+        entries = RowSet(entries.encoder, entries.rows[:limit])
+        last = entries[limit - 1]
+        next_cursor = encode_cursor(last["created_at"], last["id"])
+    return {"entries": entries, "next_cursor": next_cursor}
+
 
 @version_history.route("/<int:event_id>/history/<int:version_number>", methods=["GET"])
 @jwt_required()
@@ -24,20 +80,28 @@ def get_version(event_id, version_number):
         in: path
         type: integer
         required: true
+      - name: If-None-Match
+        in: header
+        type: string
+        required: false
     responses:
       200:
-        description: Specific version of the event
+        description: Specific version of the event; versions never change, so it may be cached indefinitely
+      304:
+        description: The client already holds this version
       404:
         description: Version not found
     """
-    db = RDSHelper()
-    version = db.execute_query(
-        "SELECT * FROM event_versions WHERE event_id = %s AND version_number = %s",
-        (event_id, version_number),
-    )
-    if not version:
+    # Versions are immutable: a client holding this ETag holds this exact
+    # row, so no lookup is needed to answer it.
+    etag = event_etag(event_id, version_number)
+    if etag_matches(etag):
+        return not_modified(etag, IMMUTABLE)
+    # Delta versions are rebuilt from the nearest snapshot at or below them.
+    version = load_version(RDSHelper().execute_query, event_id, version_number)
+    if version is None:
         return jsonify({"error": "Version not found"}), 404
-    return jsonify(version[0]), 200
+    return tag(jsonify(version), etag, IMMUTABLE)
 
 
 
@@ -61,13 +125,27 @@ def rollback_version(event_id, version_number):
         required: true
     responses:
       200:
-        description: Event rolled back to the specified version
-      400:
-        description: Rollback failed
+        description: >
+          Event rolled back; the rollback is recorded as a new version, whose
+          number is returned in the body and ETag
+      404:
+        description: Event or version not found
     """
+    user_id = int(get_jwt_identity())
     db = RDSHelper()
-    db.execute_command("SELECT rollback_event_to_version(%s, %s)", (event_id, version_number))
-    return jsonify({"message": "Rolled back to version"}), 200
+    with db.transaction() as tx:
+        result = tx.query(
+            "SELECT rollback_event_to_version(%s, %s, %s) AS version",
+            (event_id, version_number, user_id),
+            prepare=True,
+        )
+    new_version = result[0]["version"]
+    if new_version is None:
+        return jsonify({"error": "Event or version not found"}), 404
+    event_cache.invalidate(event_id)
+    response = jsonify({"message": "Rolled back to version", "version": new_version})
+    response.set_etag(event_etag(event_id, new_version))
+    return response, 200
 
 
 # Changelog and Diff
@@ -84,15 +162,142 @@ def get_changelog(event_id):
         in: path
         type: integer
         required: true
+      - in: query
+        name: cursor
+        type: string
+        required: false
+        description: >
+          Keyset pagination, newest first. Pass an empty value for the first
+          page, then the returned next_cursor. Without it the whole filtered
+          changelog is streamed as a JSON array.
+      - in: query
+        name: limit
+        type: integer
+        default: 50
+        description: Page size in cursor mode (capped)
+      - in: query
+        name: since
+        type: string
+        format: date-time
+      - in: query
+        name: until
+        type: string
+        format: date-time
+      - in: query
+        name: action
+        type: string
+        enum: [create, update, delete]
+      - in: query
+        name: user_id
+        type: integer
+        description: Only entries made by this user
+      - name: If-None-Match
+        in: header
+        type: string
+        required: false
     responses:
       200:
-        description: Changelog entries for the event
-      404:
-        description: Event or changelog not found
+        description: Changelog entries for the event, newest first
+      304:
+        description: No entries were added since the client's copy (If-None-Match)
+      400:
+        description: Invalid filter or cursor
     """
     db = RDSHelper()
-    log = db.execute_query("SELECT * FROM event_changelog WHERE event_id = %s ORDER BY created_at DESC", (event_id,))
-    return jsonify(log), 200
+    try:
+        clauses, params = _changelog_filters(request.args)
+        limit = _page_limit(request.args, db.config.page_size_max)
+    except ValueError as ex:
+        return jsonify({"error": str(ex)}), 400
+    # The changelog is append-only, so its entry count identifies its
+    # content; a trigger keeps it in event_changelog_heads, committed with
+    # the entries themselves.
+    head = db.execute_query(
+        "SELECT entries FROM event_changelog_heads WHERE event_id = %s",
+        (event_id,),
+        prepare=True,
+    )
+    etag = f"changelog-{event_id}-{head[0]['entries'] if head else 0}"
+    if etag_matches(etag):
+        return not_modified(etag)
+
+    where = " AND ".join(["c.event_id = %s", *clauses])
+    sql = f"SELECT c.* FROM event_changelog c WHERE {where} {CHANGELOG_ORDER}"
+    params = [event_id, *params]
+    if "cursor" not in request.args:
+        return tag(json_stream_response(db.execute_query_iter(sql, params)), etag)
+    entries = db.execute_query_rows(f"{sql} LIMIT %s", [*params, limit + 1], prepare=True)
+    return tag(jsonify(_changelog_page(entries, limit)), etag)
+
+
+@version_history.route("/activity", methods=["GET"])
+@jwt_required()
+def get_activity_feed():
+    """
+    My Activity Feed
+    ---
+    tags:
+      - Events
+    parameters:
+      - in: query
+        name: cursor
+        type: string
+        required: false
+        description: next_cursor of the previous page
+      - in: query
+        name: limit
+        type: integer
+        default: 50
+      - in: query
+        name: since
+        type: string
+        format: date-time
+      - in: query
+        name: until
+        type: string
+        format: date-time
+      - in: query
+        name: action
+        type: string
+        enum: [create, update, delete]
+      - in: query
+        name: user_id
+        type: integer
+        description: Only entries made by this user
+    responses:
+      200:
+        description: >
+          Changelog entries of every event the caller owns or has a permission
+          on, newest first, as {"entries": [...], "next_cursor": ...}
+      400:
+        description: Invalid filter or cursor
+    """
+    user_id = int(get_jwt_identity())
+    db = RDSHelper()
+    try:
+        clauses, params = _changelog_filters(request.args)
+        limit = _page_limit(request.args, db.config.page_size_max)
+    except ValueError as ex:
+        return jsonify({"error": str(ex)}), 400
+    where = " AND ".join(["c.event_id = a.event_id", *clauses])
+    # Each accessible event contributes at most one page from its
+    # (event_id, created_at, id) index range; the outer sort merges them.
+    entries = db.execute_query_rows(
+        f"""
+        SELECT c.* FROM (
+            SELECT id AS event_id FROM events WHERE user_id = %s
+            UNION
+            SELECT event_id FROM event_permissions WHERE user_id = %s
+        ) a
+        CROSS JOIN LATERAL (
+            SELECT c.* FROM event_changelog c WHERE {where} {CHANGELOG_ORDER} LIMIT %s
+        ) c
+        {CHANGELOG_ORDER} LIMIT %s
+        """,
+        [user_id, user_id, *params, limit + 1, limit + 1],
+        prepare=True,
+    )
+    return jsonify(_changelog_page(entries, limit)), 200
 
 
 @version_history.route("/<int:event_id>/diff/<int:v1>/<int:v2>", methods=["GET"])
@@ -121,13 +326,56 @@ def get_diff(event_id, v1, v2):
         description: Second version number
     responses:
       200:
-        description: Differences between the two event versions
+        description: >
+          Fields that differ between the two versions ({"field": {"from", "to"}})
+          and a unified line diff of the description
       404:
-        description: Diff not found
+        description: One of the versions does not exist
+    """
+    etag = f"diff-{event_id}-{v1}-{v2}"
+    if etag_matches(etag):
+        return not_modified(etag, IMMUTABLE)
+    diff = version_diff(RDSHelper().execute_query, event_id, v1, v2)
+    if diff is None:
+        return jsonify({"error": "Version not found"}), 404
+    return tag(jsonify(diff), etag, IMMUTABLE)
+
+
+@version_history.route("/<int:event_id>/diffs", methods=["GET"])
+@jwt_required()
+def get_diff_range(event_id):
     """
+    Get Successive Diffs Over a Version Range
+    ---
+    tags:
+      - Version History
+    parameters:
+      - name: event_id
+        in: path
+        type: integer
+        required: true
+      - in: query
+        name: from
+        type: integer
+        required: true
+        description: First version of the range
+      - in: query
+        name: to
+        type: integer
+        required: true
+        description: Last version of the range
+    responses:
+      200:
+        description: The diff of each version against its predecessor, from+1 through to
+      400:
+        description: Missing, invalid or oversized range
+    """
+    try:
+        first = int(request.args["from"])
+        last = int(request.args["to"])
+    except (KeyError, ValueError):
+        return jsonify({"error": "from and to must be version numbers"}), 400
     db = RDSHelper()
-    diff = db.execute_query(
-        "SELECT * FROM event_version_diffs WHERE event_id = %s AND version1 = %s AND version2 = %s",
-        (event_id, v1, v2),
-    )
-    return jsonify(diff[0] if diff else {"error": "Diff not found"}), 200
+    if not 1 <= first <= last or last - first > db.config.diff_range_max:
+        return jsonify({"error": f"Require 1 <= from <= to and at most {db.config.diff_range_max} versions"}), 400
+    return jsonify({"diffs": successive_diffs(db.execute_query, event_id, first, last)}), 200
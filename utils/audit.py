@@ -0,0 +1,325 @@
+import os
+import glob
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+
+from .config import Config
+from .metrics import Histogram
+from .rds_helper import RDSHelper
+
+CHANGELOG = "changelog"
+DIFF = "diff"
+
+CHANGELOG_INSERT_SQL = """
+    INSERT INTO event_changelog (event_id, action, user_id, description)
+    VALUES (%s, %s, %s, %s)
+"""
+DIFF_INSERT_SQL = """
+    INSERT INTO event_version_diffs (event_id, version_number, diff_summary)
+    VALUES (%s, %s, %s)
+"""
+
+# Batched inserts stamp created_at as NOW() minus the row's age, keeping the
+# database clock, and skip rows whose event was deleted in the meantime
+# rather than failing the whole batch on the foreign key.
+BATCH_SQL = {
+    CHANGELOG: """
+        INSERT INTO event_changelog (event_id, action, user_id, description, created_at)
+        SELECT v.event_id, v.action, v.user_id, v.description, NOW() - v.age * interval '1 second'
+        FROM (VALUES %s) AS v(event_id, action, user_id, description, age)
+        JOIN events e ON e.id = v.event_id
+    """,
+    DIFF: """
+        INSERT INTO event_version_diffs (event_id, version_number, diff_summary, created_at)
+        SELECT v.event_id, v.version_number, v.diff_summary, NOW() - v.age * interval '1 second'
+        FROM (VALUES %s) AS v(event_id, version_number, diff_summary, age)
+        JOIN events e ON e.id = v.event_id
+    """,
+}
+BATCH_TEMPLATE = {
+    CHANGELOG: "(%s::int, %s::text, %s::int, %s::text, %s::float8)",
+    DIFF: "(%s::int, %s::int, %s::text, %s::float8)",
+}
+
+
+class SyncAuditLog:
+    """Default mode: audit rows are written in the request's transaction."""
+
+    def record(self, tx, changelog, diff=None):
+        tx.defer(CHANGELOG_INSERT_SQL, changelog)
+        if diff is not None:
+            tx.defer(DIFF_INSERT_SQL, diff)
+
+    def stats(self):
+        return {}
+
+    def flush_latency(self):
+        return None
+
+
+class WriteBehindAuditLog:
+    """Audit rows are queued once the request's transaction commits and
+    batch-inserted by a background worker.
+
+    The queue is bounded. When it is full, and at shutdown, rows are
+    appended to a per-process spill file instead. A failed batch is spilled
+    the same way. Spill files, including those left by dead processes, are
+    replayed by the worker. Rows are only counted as dropped when they could
+    be neither inserted nor spilled.
+    """
+
+    def __init__(self, batch_size=500, flush_interval=1.0, queue_limit=10000,
+                 spill_dir=".", replay_interval=30.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue_limit = queue_limit
+        self.spill_dir = spill_dir
+        self.replay_interval = replay_interval
+        self._queue = None
+        self._worker = None
+        self._pid = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._latency = Histogram()
+        self.enqueued = 0
+        self.flushed = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.failures = 0
+        self.dropped = 0
+        atexit.register(self.close)
+
+    def _needs_worker(self):
+        return self._worker is None or self._pid != os.getpid() or not self._worker.is_alive()
+
+    def _ensure_worker(self):
+        """Start the worker on first use, after a fork, or if it has died;
+        a restart in the same process keeps the rows already queued."""
+        if self._needs_worker():
+            with self._lock:
+                if self._needs_worker():
+                    if self._worker is not None and self._pid == os.getpid():
+                        logging.error("Audit writer thread died, restarting it")
+                    else:
+                        self._queue = queue.Queue(self.queue_limit)
+                    self._stopping = threading.Event()
+                    self._worker = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                    self._pid = os.getpid()
+                    self._worker.start()
+        return self._queue
+
+    def record(self, tx, changelog, diff=None):
+        tx.after_commit(lambda: self.enqueue(CHANGELOG, changelog))
+        if diff is not None:
+            tx.after_commit(lambda: self.enqueue(DIFF, diff))
+
+    def enqueue(self, kind, row):
+        item = (kind, tuple(row), time.time())
+        try:
+            self._ensure_worker().put_nowait(item)
+        except queue.Full:
+            self._spill_or_drop([item])
+            return
+        with self._lock:
+            self.enqueued += 1
+
+    def _take_batch(self):
+        """Block for the first row, then gather more until the batch is
+        full or ``flush_interval`` has passed since that first row."""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size and not self._stopping.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        next_replay = 0.0
+        while not self._stopping.is_set():
+            # Nothing may escape this loop: a dead worker would leave rows
+            # piling up in the queue until it overflows into spill files.
+            try:
+                batch = self._take_batch()
+                if batch:
+                    self._flush(batch)
+                if time.monotonic() >= next_replay:
+                    next_replay = time.monotonic() + self.replay_interval
+                    self._replay_spills()
+            except Exception:
+                logging.exception("Audit writer iteration failed")
+                self._stopping.wait(self.flush_interval)
+
+    def _insert(self, batch):
+        now = time.time()
+        by_kind = {}
+        for kind, row, enqueued_at in batch:
+            by_kind.setdefault(kind, []).append((*row, max(now - enqueued_at, 0.0)))
+        with RDSHelper() as db:
+            with db.transaction() as tx:
+                for kind, rows in by_kind.items():
+                    tx.execute_values(BATCH_SQL[kind], rows, template=BATCH_TEMPLATE[kind], page_size=self.batch_size)
+
+    def _flush(self, batch, replaying=False):
+        """Insert ``batch``; on failure spill it and return False. When the
+        spill fails too, replayed rows raise (their file is kept) and live
+        rows are dropped."""
+        started = time.perf_counter()
+        try:
+            self._insert(batch)
+        except Exception as ex:
+            logging.error(f"Audit flush of {len(batch)} rows failed, spilling: {ex}")
+            with self._lock:
+                self.failures += 1
+            if replaying:
+                self._spill(batch)
+            else:
+                self._spill_or_drop(batch)
+            return False
+        with self._lock:
+            self._latency.observe(time.perf_counter() - started)
+            self.flushed += len(batch)
+        return True
+
+    def _spill_path(self, pid=None):
+        return os.path.join(self.spill_dir, f"audit-spill-{pid or os.getpid()}.ndjson")
+
+    def _spill(self, batch):
+        lines = "".join(
+            json.dumps({"kind": kind, "row": list(row), "at": enqueued_at}, default=str) + "\n"
+            for kind, row, enqueued_at in batch
+        )
+        with self._spill_lock:
+            with open(self._spill_path(), "a", encoding="utf-8") as spill:
+                spill.write(lines)
+                spill.flush()
+                os.fsync(spill.fileno())
+            self.spilled += len(batch)
+
+    def _spill_or_drop(self, batch):
+        try:
+            self._spill(batch)
+        except OSError as ex:
+            logging.error(f"Audit spill of {len(batch)} rows failed, dropping them: {ex}")
+            with self._lock:
+                self.dropped += len(batch)
+
+    def _claim(self, path):
+        """Take ownership of a spill file by renaming it; None if another
+        process got there first or its owner is still alive. The owner is
+        the pid at the end of the name: the writer of a spill file, or the
+        replayer of one already claimed (left behind by a failed replay)."""
+        try:
+            pid = int(path.rsplit("-", 1)[1].split(".")[0])
+        except ValueError:
+            return None
+        if pid == os.getpid():
+            if ".replaying-" in path:
+                return path
+        else:
+            try:
+                os.kill(pid, 0)
+                return None
+            except ProcessLookupError:
+                pass
+            except PermissionError:
+                return None
+        claimed = f"{path.split('.replaying-', 1)[0]}.replaying-{os.getpid()}"
+        try:
+            with self._spill_lock:
+                os.rename(path, claimed)
+        except FileNotFoundError:
+            return None
+        return claimed
+
+    @staticmethod
+    def _read_spill(path):
+        """Rows of a spill file; lines that do not parse (e.g. one cut short
+        by a crash mid-write) are logged and skipped."""
+        batch = []
+        with open(path, encoding="utf-8") as spill:
+            for number, line in enumerate(spill, 1):
+                if not line.strip():
+                    continue
+                try:
+                    item = json.loads(line)
+                    batch.append((item["kind"], tuple(item["row"]), item["at"]))
+                except (ValueError, KeyError, TypeError) as ex:
+                    logging.error(f"Skipping malformed audit spill line {path}:{number}: {ex}")
+        return batch
+
+    def _replay_spills(self):
+        pattern = os.path.join(self.spill_dir, "audit-spill-*.ndjson")
+        for path in glob.glob(pattern) + glob.glob(f"{pattern}.replaying-*"):
+            claimed = self._claim(path)
+            if claimed is None:
+                continue
+            batch = self._read_spill(claimed)
+            # Every chunk is inserted or re-spilled to this process's spill
+            # file before the claimed file goes; if a chunk can be neither,
+            # _flush raises and the file is retried on the next replay.
+            for start in range(0, len(batch), self.batch_size):
+                chunk = batch[start:start + self.batch_size]
+                if self._flush(chunk, replaying=True):
+                    with self._lock:
+                        self.replayed += len(chunk)
+            os.remove(claimed)
+
+    def close(self):
+        """Stop the worker and spill whatever is still queued."""
+        if self._worker is None or self._pid != os.getpid():
+            return
+        self._stopping.set()
+        self._worker.join(timeout=self.flush_interval * 2 + 5)
+        remaining = []
+        while True:
+            try:
+                remaining.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if remaining:
+            self._spill_or_drop(remaining)
+        self._worker = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+                "queue_limit": self.queue_limit,
+                "enqueued": self.enqueued,
+                "flushed": self.flushed,
+                "spilled": self.spilled,
+                "replayed": self.replayed,
+                "failures": self.failures,
+                "dropped": self.dropped,
+            }
+
+    def flush_latency(self):
+        return self._latency
+
+
+def build_audit_log(config=None):
+    config = config or Config()
+    if not config.audit_write_behind:
+        return SyncAuditLog()
+    return WriteBehindAuditLog(
+        batch_size=config.audit_batch_size,
+        flush_interval=config.audit_flush_interval,
+        queue_limit=config.audit_queue_limit,
+        spill_dir=config.audit_spill_dir,
+    )
+
+
+audit_log = build_audit_log()
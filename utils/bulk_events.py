@@ -0,0 +1,121 @@
+EVENT_FIELDS = ("title", "description", "start_time", "end_time", "recurrence_rule")
+
+
+def validate_events(events):
+    """Return the index of the first event missing title/start_time, or None."""
+    for index, event in enumerate(events):
+        if not isinstance(event, dict) or not event.get("title") or not event.get("start_time"):
+            return index
+    return None
+
+
+def bulk_create_events(tx, user_id, events, chunk_size=1000):
+    """Insert events with their initial version, changelog and diff rows
+    set-wise inside ``tx``. Returns the new ids in input order."""
+    created_ids = []
+    for start in range(0, len(events), chunk_size):
+        chunk = events[start:start + chunk_size]
+        # Ids are reserved up front so they map onto the input by position,
+        # independent of the order INSERT ... RETURNING would produce.
+        ids = [row["id"] for row in tx.query(
+            "SELECT nextval(pg_get_serial_sequence('events', 'id')) AS id "
+            "FROM generate_series(1, %s)",
+            (len(chunk),),
+        )]
+        tx.execute_values(
+            """
+            INSERT INTO events (id, title, description, user_id, start_time, end_time, recurrence_rule)
+            VALUES %s
+            """,
+            [
+                (
+                    event_id,
+                    event.get("title"),
+                    event.get("description"),
+                    user_id,
+                    event.get("start_time"),
+                    event.get("end_time"),
+                    event.get("recurrence_rule"),
+                )
+                for event_id, event in zip(ids, chunk)
+            ],
+            page_size=len(chunk),
+        )
+        tx.defer(
+            """
+            INSERT INTO event_versions (
+                event_id, version_number, title, description, start_time, end_time,
+                recurrence_rule, updated_by, change_summary
+            )
+            SELECT id, 1, title, description, start_time, end_time,
+                   recurrence_rule, user_id, 'Initial event creation'
+            FROM events WHERE id = ANY(%s)
+            """,
+            (ids,)
+        )
+        tx.defer(
+            """
+            INSERT INTO event_changelog (event_id, action, user_id, description)
+            SELECT id, 'create', %s, 'Created event' FROM unnest(%s::int[]) AS id
+            """,
+            (user_id, ids)
+        )
+        tx.defer(
+            """
+            INSERT INTO event_version_diffs (event_id, version_number, diff_summary)
+            SELECT id, 1, 'Initial version created' FROM unnest(%s::int[]) AS id
+            """,
+            (ids,)
+        )
+        created_ids.extend(ids)
+    return created_ids
+
+
+def copy_import_chunk(tx, user_id, events):
+    """COPY ``events`` into a session staging table and move them, with their
+    version, changelog and diff rows, into the event tables in one statement.
+    Returns the number of events imported."""
+    tx.execute(
+        """
+        CREATE TEMP TABLE IF NOT EXISTS event_import_staging (
+            ord INTEGER,
+            title TEXT,
+            description TEXT,
+            start_time TIMESTAMP,
+            end_time TIMESTAMP,
+            recurrence_rule TEXT
+        ) ON COMMIT DELETE ROWS
+        """
+    )
+    tx.copy_rows_in(
+        "event_import_staging",
+        ("ord",) + EVENT_FIELDS,
+        ([position] + [event.get(field) for field in EVENT_FIELDS] for position, event in enumerate(events)),
+    )
+    result = tx.query(
+        """
+        WITH new_events AS (
+            INSERT INTO events (title, description, user_id, start_time, end_time, recurrence_rule)
+            SELECT title, description, %(user_id)s, start_time, end_time, recurrence_rule
+            FROM event_import_staging ORDER BY ord
+            RETURNING id, title, description, start_time, end_time, recurrence_rule
+        ), versions AS (
+            INSERT INTO event_versions (
+                event_id, version_number, title, description, start_time, end_time,
+                recurrence_rule, updated_by, change_summary
+            )
+            SELECT id, 1, title, description, start_time, end_time,
+                   recurrence_rule, %(user_id)s, 'Initial event creation'
+            FROM new_events
+        ), changelog AS (
+            INSERT INTO event_changelog (event_id, action, user_id, description)
+            SELECT id, 'create', %(user_id)s, 'Imported event' FROM new_events
+        ), diffs AS (
+            INSERT INTO event_version_diffs (event_id, version_number, diff_summary)
+            SELECT id, 1, 'Initial version created' FROM new_events
+        )
+        SELECT count(*) AS imported FROM new_events
+        """,
+        {"user_id": user_id},
+    )
+    return result[0]["imported"]
@@ -7,3 +7,38 @@ class Config:
     database: str = "Collaborative_Event_Management_System"
     user: str = "postgres"
     password: str = "12345678"
+    pool_min_size: int = 1
+    pool_max_size: int = 10
+    pool_timeout: float = 30.0
+    pool_health_check_idle: float = 30.0
+    bulk_chunk_size: int = 1000
+    stream_itersize: int = 2000
+    prepared_cache_size: int = 100
+    slow_query_ms: float = 200.0
+    metrics_max_series: int = 1000
+    replica_dsns: tuple = ()
+    replica_selection: str = "round_robin"
+    read_your_writes_seconds: float = 5.0
+    role_cache_size: int = 10000
+    role_cache_ttl: float = 60.0
+    password_hash_workers: int = 0
+    password_hash_queue_limit: int = 64
+    revocation_backend: str = "local"
+    revocation_sync_interval: float = 1.0
+    page_size_max: int = 500
+    rrule_cache_size: int = 10000
+    rrule_cache_ttl: float = 3600.0
+    occurrences_max: int = 5000
+    conflict_slots_max: int = 100
+    event_cache_backend: str = "local"
+    event_cache_max_bytes: int = 32 * 1024 * 1024
+    event_cache_ttl: float = 300.0
+    version_snapshot_interval: int = 10
+    diff_cache_size: int = 10000
+    diff_cache_ttl: float = 86400.0
+    diff_range_max: int = 500
+    audit_write_behind: bool = False
+    audit_batch_size: int = 500
+    audit_flush_interval: float = 1.0
+    audit_queue_limit: int = 10000
+    audit_spill_dir: str = "."
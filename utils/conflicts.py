@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+
+from .interval_tree import IntervalTree
+from .recurrence import expand_occurrences, to_naive_utc
+
+# Matches the event_period() SQL function: a zero-length or open-ended event
+# is the single instant at its start, anything else is [start, end).
+ONE_OFF_CONFLICTS_SQL = """
+    SELECT s.slot, e.id, e.title, e.start_time, e.end_time
+    FROM unnest(%s::timestamp[], %s::timestamp[]) WITH ORDINALITY AS s(start_time, end_time, slot)
+    JOIN events e
+      ON e.user_id = %s
+     AND e.recurrence_rule IS NULL
+     AND e.id IS DISTINCT FROM %s
+     AND event_period(e.start_time, e.end_time) && event_period(s.start_time, s.end_time)
+"""
+
+# recurrence_end is NULL for open-ended rules; finished rules are skipped.
+RECURRING_CANDIDATES_SQL = """
+    SELECT id, title, start_time, end_time, recurrence_rule FROM events
+    WHERE user_id = %s AND recurrence_rule IS NOT NULL AND start_time <= %s
+      AND (recurrence_end IS NULL OR recurrence_end >= %s)
+      AND id IS DISTINCT FROM %s
+"""
+
+
+def parse_slot(start, end=None):
+    """Parse ISO 8601 slot bounds into naive UTC; raises ValueError."""
+    if not start:
+        raise ValueError("start_time is required")
+    start = to_naive_utc(datetime.fromisoformat(start))
+    end = to_naive_utc(datetime.fromisoformat(end)) if end else None
+    return start, end
+
+
+def _period_end(start, end):
+    return end if end is not None and end > start else start
+
+
+def _conflict(event_id, title, start, end, recurring):
+    return {
+        "event_id": event_id,
+        "title": title,
+        "start_time": start,
+        "end_time": end,
+        "recurring": recurring,
+    }
+
+
+def find_conflicts(query, user_id, slots, exclude_event_id=None, limit=5000):
+    """Events of ``user_id`` overlapping each ``(start, end)`` slot.
+
+    ``query`` is ``RDSHelper.execute_query`` or ``Transaction.query``. One-off
+    events are matched in a single statement against the GiST period index;
+    recurring events that have not finished before the span are expanded
+    once, starting from the span rather than from each rule's first
+    occurrence, into an interval tree that every slot is then probed
+    against. This runs under the per-user advisory lock in checked writes,
+    so its cost scales with the span, not with the age of the rules. Returns
+    ``(conflicts_per_slot, truncated)``; ``truncated`` means recurring
+    expansion hit ``limit`` and later occurrences were not checked.
+    """
+    results = [[] for _ in slots]
+    if not slots:
+        return results, False
+
+    rows = query(
+        ONE_OFF_CONFLICTS_SQL,
+        ([start for start, _ in slots], [end for _, end in slots], user_id, exclude_event_id),
+    )
+    for row in rows:
+        results[row["slot"] - 1].append(
+            _conflict(row["id"], row["title"], row["start_time"], row["end_time"], False)
+        )
+
+    span_start = min(start for start, _ in slots)
+    span_end = max(_period_end(start, end) for start, end in slots)
+    candidates = query(RECURRING_CANDIDATES_SQL, (user_id, span_end, span_start, exclude_event_id), prepare=True)
+    truncated = False
+    if candidates:
+        # The expansion window is half-open; widen it so occurrences starting
+        # exactly at the last slot's end (or instant) are still seen.
+        occurrences, truncated = expand_occurrences(
+            candidates, span_start, span_end + timedelta(microseconds=1), limit
+        )
+        tree = IntervalTree(
+            (o["start_time"], _period_end(o["start_time"], o["end_time"]), o) for o in occurrences
+        )
+        for index, (start, end) in enumerate(slots):
+            for o in tree.overlapping(start, _period_end(start, end)):
+                results[index].append(
+                    _conflict(o["event_id"], o["title"], o["start_time"], o["end_time"], True)
+                )
+
+    for conflicts in results:
+        conflicts.sort(key=lambda c: (c["start_time"], c["event_id"]))
+    return results, truncated
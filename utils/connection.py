@@ -1,21 +1,250 @@
+import os
+import time
+import logging
+import threading
+import itertools
 import psycopg2
+from psycopg2 import extensions
 from .config import Config
 
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of psycopg2 connections for one process."""
+
+    def __init__(self, config, dsn=None):
+        self.config = config
+        self.dsn = dsn
+        self.min_size = config.pool_min_size
+        self.max_size = config.pool_max_size
+        self.timeout = config.pool_timeout
+        self.health_check_idle = config.pool_health_check_idle
+        self.pid = os.getpid()
+        self._cond = threading.Condition()
+        self._idle = []
+        self._size = 0
+        self._waiting = 0
+        self._closed = False
+        self._borrows = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._last_failure = 0.0
+        self._health_checks = 0
+        self._health_failures = 0
+        for _ in range(self.min_size):
+            self._idle.append((self._connect(), time.monotonic()))
+            self._size += 1
+
+    def _connect(self):
+        if self.dsn:
+            return psycopg2.connect(self.dsn)
+        return psycopg2.connect(
+            host=self.config.host,
+            database=self.config.database,
+            user=self.config.user,
+            password=self.config.password,
+            port=self.config.port
+        )
+
+    def getconn(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        with self._cond:
+            if self._closed:
+                raise PoolTimeout("Connection pool is closed")
+            self._waiting += 1
+            try:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(
+                            f"Timed out after {timeout}s waiting for a DB connection"
+                        )
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+            waited = time.monotonic() - started
+            self._borrows += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+            if self._idle:
+                conn, returned_at = self._idle.pop()
+            else:
+                conn = None
+                self._size += 1
+        if conn is not None:
+            if not self._needs_check(returned_at) or self._ping(conn):
+                return conn
+            conn = None
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def _needs_check(self, returned_at):
+        # Only probe connections that sat idle long enough to have been
+        # dropped, or that were parked before a failure was observed.
+        return (
+            time.monotonic() - returned_at >= self.health_check_idle
+            or returned_at <= self._last_failure
+        )
+
+    def _ping(self, conn):
+        self._health_checks += 1
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1;")
+            cursor.fetchall()
+            cursor.close()
+            conn.rollback()
+            return True
+        except Exception as ex:
+            logging.error(f"DB connection failed health check: {ex}")
+            self._health_failures += 1
+            self._last_failure = time.monotonic()
+            self._close_quietly(conn)
+            return False
+
+    def putconn(self, conn, discard=False):
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception as ex:
+                logging.error(f"Discarding broken DB connection: {ex}")
+                discard = True
+        with self._cond:
+            if discard or conn.closed or self._closed:
+                if discard:
+                    self._last_failure = time.monotonic()
+                self._size -= 1
+                self._close_quietly(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def in_use(self):
+        return self._size - len(self._idle)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "waiting": self._waiting,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "borrows": self._borrows,
+                "timeouts": self._timeouts,
+                "wait_seconds_total": self._wait_total,
+                "wait_seconds_max": self._wait_max,
+                "health_checks": self._health_checks,
+                "health_check_failures": self._health_failures,
+            }
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
 class Connection:
     _instance = None
-    
+    _replicas = None
+    _next_replica = itertools.count()
+    _lock = threading.Lock()
+    # Pools inherited across a fork are kept referenced (never closed) so
+    # the child does not send a terminate message on the parent's sockets.
+    _abandoned = []
+
     @classmethod
     def getInstance(cls, config=None):
-        if cls._instance is None:
-            cls._instance = psycopg2.connect(
-                host=config.host,
-                database=config.database,
-                user=config.user,
-                password=config.password,
-                port=config.port
-            )
-        return cls._instance
+        pool = cls._instance
+        if pool is not None and pool.pid == os.getpid():
+            return pool
+        with cls._lock:
+            if cls._instance is not None and cls._instance.pid != os.getpid():
+                cls._reset_after_fork()
+            if cls._instance is None:
+                cls._instance = ConnectionPool(config or Config())
+            return cls._instance
+
+    @classmethod
+    def getReplicas(cls, config=None):
+        replicas = cls._replicas
+        if replicas is not None and (not replicas or replicas[0].pid == os.getpid()):
+            return replicas
+        config = config or Config()
+        with cls._lock:
+            if cls._replicas and cls._replicas[0].pid != os.getpid():
+                cls._reset_after_fork()
+            if cls._replicas is None:
+                cls._replicas = [ConnectionPool(config, dsn) for dsn in config.replica_dsns]
+            return cls._replicas
+
+    @classmethod
+    def getReadPool(cls, config=None):
+        """Pick a replica pool for a read, falling back to the primary."""
+        config = config or Config()
+        replicas = cls.getReplicas(config)
+        if not replicas:
+            return cls.getInstance(config)
+        if config.replica_selection == "least_loaded":
+            return min(replicas, key=ConnectionPool.in_use)
+        return replicas[next(cls._next_replica) % len(replicas)]
+
+    @classmethod
+    def _reset_after_fork(cls):
+        if cls._instance is not None:
+            cls._abandoned.append(cls._instance)
+            cls._instance = None
+        if cls._replicas:
+            cls._abandoned.extend(cls._replicas)
+        cls._replicas = None
+        cls._lock = threading.Lock()
+
+    @classmethod
+    def stats(cls):
+        """Stats of every pool created in this process, keyed by pool name."""
+        pools = {}
+        if cls._instance is not None and cls._instance.pid == os.getpid():
+            pools["primary"] = cls._instance.stats()
+        for index, pool in enumerate(cls._replicas or ()):
+            if pool.pid == os.getpid():
+                pools[f"replica_{index}"] = pool.stats()
+        return pools
 
     @classmethod
     def delete_instance(cls):
-        cls._instance = None
+        with cls._lock:
+            if cls._instance is not None:
+                cls._instance.close()
+            for pool in cls._replicas or ():
+                pool.close()
+            cls._instance = None
+            cls._replicas = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=Connection._reset_after_fork)
@@ -0,0 +1,139 @@
+import csv
+import io
+import json
+import time
+import queue
+import logging
+import threading
+import codecs
+
+from .connection import Connection
+
+_DONE = object()
+
+
+class _QueueWriter:
+    """File-like sink for copy_expert that hands bounded chunks to a queue."""
+
+    def __init__(self, chunks, cancelled, chunk_bytes):
+        self.chunks = chunks
+        self.cancelled = cancelled
+        self.chunk_bytes = chunk_bytes
+        self._buffer = []
+        self._size = 0
+
+    def write(self, data):
+        self._buffer.append(data)
+        self._size += len(data)
+        if self._size >= self.chunk_bytes:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            chunk = b"".join(self._buffer)
+            self._buffer, self._size = [], 0
+            self.put(chunk)
+
+    def put(self, item):
+        while True:
+            if self.cancelled.is_set():
+                raise IOError("COPY consumer went away")
+            try:
+                self.chunks.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                pass
+
+
+def stream_copy_out(sql, params=None, pool=None, chunk_bytes=64 * 1024, max_chunks=8):
+    """Yield the output of ``COPY ... TO STDOUT`` as byte chunks.
+
+    The COPY runs on a dedicated pooled connection in a background thread;
+    at most ``max_chunks`` chunks are buffered, so memory stays bounded no
+    matter how large the result is.
+    """
+    pool = pool or Connection.getReadPool()
+    conn = pool.getconn()
+    chunks = queue.Queue(maxsize=max_chunks)
+    cancelled = threading.Event()
+    writer = _QueueWriter(chunks, cancelled, chunk_bytes)
+
+    def run():
+        broken = False
+        try:
+            cursor = conn.cursor()
+            cursor.copy_expert(cursor.mogrify(sql, params), writer)
+            cursor.close()
+            writer.flush()
+            conn.rollback()
+        except Exception as ex:
+            broken = True
+            if not cancelled.is_set():
+                logging.error(f"COPY export failed: {ex}")
+                try:
+                    writer.put(ex)
+                except IOError:
+                    pass
+        finally:
+            pool.putconn(conn, discard=broken)
+            try:
+                writer.put(_DONE)
+            except IOError:
+                pass
+
+    started = time.monotonic()
+    total_bytes = total_rows = 0
+    threading.Thread(target=run, daemon=True).start()
+    try:
+        while True:
+            item = chunks.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            total_bytes += len(item)
+            total_rows += item.count(b"\n")
+            yield item
+    finally:
+        cancelled.set()
+        elapsed = max(time.monotonic() - started, 1e-9)
+        logging.info(
+            f"COPY export streamed {total_rows} rows / {total_bytes} bytes in "
+            f"{elapsed:.3f}s ({total_rows / elapsed:.0f} rows/s)"
+        )
+
+
+def iter_lines(stream, block_size=64 * 1024):
+    """Yield decoded lines (with line endings) from a binary stream."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+        *lines, pending = (pending + decoder.decode(block)).split("\n")
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+def iter_ndjson(lines):
+    for line in lines:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_csv(lines):
+    yield from csv.DictReader(lines)
+
+
+def copy_rows_in(cursor, table, columns, rows):
+    """COPY ``rows`` (sequences matching ``columns``) into ``table``."""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+    )
@@ -0,0 +1,67 @@
+import difflib
+
+from .bulk_events import EVENT_FIELDS
+from .config import Config
+from .ttl_cache import TTLCache
+from .versions import load_version_range, load_versions
+
+# Versions are immutable, so a computed diff stays valid for as long as the
+# event exists; the TTL only bounds how long a deleted event's diffs linger.
+_diffs = TTLCache(Config.diff_cache_size, Config.diff_cache_ttl)
+
+
+def text_diff(old, new, from_label, to_label):
+    """Unified diff lines between two texts (None counts as empty)."""
+    return list(difflib.unified_diff(
+        (old or "").splitlines(), (new or "").splitlines(), from_label, to_label, lineterm="",
+    ))
+
+
+def diff_versions(old, new):
+    """Per-field changes from one reconstructed version to another, plus a
+    line diff of the description when it changed."""
+    changes = {
+        field: {"from": old[field], "to": new[field]}
+        for field in EVENT_FIELDS
+        if old[field] != new[field]
+    }
+    from_version, to_version = old["version_number"], new["version_number"]
+    return {
+        "event_id": new["event_id"],
+        "from_version": from_version,
+        "to_version": to_version,
+        "changes": changes,
+        "description_diff": text_diff(
+            old["description"], new["description"], f"v{from_version}", f"v{to_version}"
+        ) if "description" in changes else [],
+    }
+
+
+def version_diff(query, event_id, v1, v2):
+    """Diff from version ``v1`` to ``v2``, or None if either does not exist.
+    Only the two versions are rebuilt, not the ones between them. ``query``
+    is ``RDSHelper.execute_query`` or ``Transaction.query``."""
+    key = (event_id, v1, v2)
+    diff = _diffs.get(key)
+    if diff is None:
+        versions = load_versions(query, event_id, (v1, v2))
+        if v1 not in versions or v2 not in versions:
+            return None
+        diff = diff_versions(versions[v1], versions[v2])
+        _diffs.set(key, diff)
+    return diff
+
+
+def successive_diffs(query, event_id, first, last):
+    """Diffs between each consecutive pair of versions ``first`` to ``last``,
+    reconstructed from a single query. Each pair is also memoized."""
+    versions = load_version_range(query, event_id, first, last)
+    diffs = []
+    for old, new in zip(versions, versions[1:]):
+        key = (event_id, old["version_number"], new["version_number"])
+        diff = _diffs.get(key)
+        if diff is None:
+            diff = diff_versions(old, new)
+            _diffs.set(key, diff)
+        diffs.append(diff)
+    return diffs
@@ -0,0 +1,40 @@
+from flask import make_response, request
+
+# Responses depend on the caller's token, so shared caches must not keep them.
+REVALIDATE = "private, no-cache"
+IMMUTABLE = "private, max-age=31536000, immutable"
+
+
+def event_etag(event_id, version):
+    return f"event-{event_id}-v{version}"
+
+
+def if_match_version(event_id):
+    """Version named by the request's If-Match for ``event_id``; None when
+    the header is absent or ``*``. Raises ValueError for any other tag."""
+    if_match = request.if_match
+    if not if_match or if_match.star_tag:
+        return None
+    tags = if_match.as_set()
+    prefix = event_etag(event_id, "")
+    if len(tags) != 1:
+        raise ValueError("If-Match must name exactly one version")
+    value = tags.pop()
+    if not value.startswith(prefix):
+        raise ValueError(f"{value} is not an ETag of event {event_id}")
+    return int(value[len(prefix):])
+
+
+def etag_matches(etag):
+    """True if the request's If-None-Match already names ``etag``."""
+    return request.if_none_match.contains_weak(etag)
+
+
+def tag(response, etag, cache_control=REVALIDATE):
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+
+def not_modified(etag, cache_control=REVALIDATE):
+    return tag(make_response("", 304), etag, cache_control)
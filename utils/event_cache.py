@@ -0,0 +1,150 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+from .config import Config
+
+# Rough per-entry bookkeeping cost (key, tuple, OrderedDict node) counted
+# against the memory cap on top of the payload itself.
+ENTRY_OVERHEAD = 200
+
+
+class LocalCacheBackend:
+    """In-process stand-in for the shared tier: stores nothing, so every
+    local miss falls through to the database.
+
+    A shared backend (memcached, Redis, ...) implements the same three
+    methods; values are ``(version, payload)`` tuples.
+    """
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl):
+        pass
+
+    def delete(self, key):
+        pass
+
+
+class EventCache:
+    """Read-through cache of serialized event payloads keyed by event id.
+
+    Each entry remembers the event version it was rendered from and is only
+    served when the caller's freshly looked-up version matches, so a write
+    from any worker makes older entries unreachable. Explicit invalidation
+    on writes frees the memory early. The local tier is an LRU bounded by
+    ``max_bytes`` of payload, with a TTL; a shared tier is consulted on
+    local misses.
+    """
+
+    def __init__(self, backend, max_bytes, ttl):
+        self.backend = backend
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _key(event_id):
+        return f"event:{event_id}"
+
+    def _pop(self, event_id):
+        entry = self._entries.pop(event_id, None)
+        if entry is not None:
+            self._bytes -= len(entry[1]) + ENTRY_OVERHEAD
+        return entry
+
+    def _store(self, event_id, version, payload):
+        size = len(payload) + ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._pop(event_id)
+            self._entries[event_id] = (version, payload, time.monotonic() + self.ttl)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted) + ENTRY_OVERHEAD
+                self.evictions += 1
+
+    def get(self, event_id, version):
+        """Payload of ``event_id`` rendered at ``version``, or None."""
+        with self._lock:
+            entry = self._entries.get(event_id)
+            if entry is not None:
+                cached_version, payload, expires_at = entry
+                if cached_version == version and expires_at > time.monotonic():
+                    self._entries.move_to_end(event_id)
+                    self.hits += 1
+                    return payload
+                self._pop(event_id)
+        try:
+            shared = self.backend.get(self._key(event_id))
+        except Exception as ex:
+            logging.warning(f"Shared event cache read failed: {ex}")
+            shared = None
+        if shared is not None and shared[0] == version:
+            self._store(event_id, version, shared[1])
+            with self._lock:
+                self.shared_hits += 1
+            return shared[1]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, event_id, version, payload):
+        self._store(event_id, version, payload)
+        try:
+            self.backend.set(self._key(event_id), (version, payload), self.ttl)
+        except Exception as ex:
+            logging.warning(f"Shared event cache write failed: {ex}")
+
+    def invalidate(self, event_id):
+        """Drop an event from both tiers; call after any committed write to
+        the event (update, rollback, delete)."""
+        with self._lock:
+            self._pop(event_id)
+            self.invalidations += 1
+        try:
+            self.backend.delete(self._key(event_id))
+        except Exception as ex:
+            logging.warning(f"Shared event cache invalidation failed: {ex}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+def build_event_cache(config=None):
+    config = config or Config()
+    backends = {"local": LocalCacheBackend}
+    return EventCache(
+        backends[config.event_cache_backend](),
+        max_bytes=config.event_cache_max_bytes,
+        ttl=config.event_cache_ttl,
+    )
+
+
+event_cache = build_event_cache()
@@ -0,0 +1,58 @@
+class IntervalTree:
+    """Static, balanced interval tree over half-open ``[start, end)`` ranges.
+
+    Built once from a list of ``(start, end, payload)`` and queried many
+    times; each node stores the largest end in its subtree so overlap
+    queries skip whole subtrees and run in O(log n + k). Zero-length
+    intervals are treated as points.
+    """
+
+    def __init__(self, intervals):
+        self._items = sorted(intervals, key=lambda item: (item[0], item[1]))
+        self._max_end = [None] * len(self._items)
+        if self._items:
+            self._build(0, len(self._items) - 1)
+
+    def __len__(self):
+        return len(self._items)
+
+    def _build(self, lo, hi):
+        mid = (lo + hi) // 2
+        max_end = self._items[mid][1]
+        if lo < mid:
+            max_end = max(max_end, self._build(lo, mid - 1))
+        if mid < hi:
+            max_end = max(max_end, self._build(mid + 1, hi))
+        self._max_end[mid] = max_end
+        return max_end
+
+    def overlapping(self, start, end):
+        """Payloads of intervals overlapping ``[start, end)`` (a point when
+        ``start == end``), in start order."""
+        found = []
+        if self._items:
+            self._query(0, len(self._items) - 1, start, end, found)
+        return found
+
+    def _query(self, lo, hi, start, end, found):
+        if lo > hi:
+            return
+        mid = (lo + hi) // 2
+        if self._max_end[mid] < start:
+            return
+        self._query(lo, mid - 1, start, end, found)
+        item_start, item_end, payload = self._items[mid]
+        if _overlaps(item_start, item_end, start, end):
+            found.append(payload)
+        if item_start < end or (start == end and item_start == end):
+            self._query(mid + 1, hi, start, end, found)
+
+
+def _overlaps(a_start, a_end, b_start, b_end):
+    if a_start == a_end and b_start == b_end:
+        return a_start == b_start
+    if a_start == a_end:
+        return b_start <= a_start < b_end
+    if b_start == b_end:
+        return a_start <= b_start < a_end
+    return a_start < b_end and b_start < a_end
@@ -0,0 +1,29 @@
+from flask import Response, current_app, stream_with_context
+
+
+def _json_array(rows, dumps):
+    yield "["
+    first = True
+    for row in rows:
+        if first:
+            first = False
+            yield dumps(row)
+        else:
+            yield "," + dumps(row)
+    yield "]"
+
+
+def json_stream_response(rows, status=200):
+    """Stream an iterable of rows as a JSON array, encoding each row as it
+    arrives. The request context stays open until the last row is sent, so
+    the request's pooled connection remains borrowed while streaming."""
+    provider = current_app.json
+
+    def dumps(row):
+        return provider.dumps(row, separators=(",", ":"))
+
+    return Response(
+        stream_with_context(_json_array(rows, dumps)),
+        status=status,
+        mimetype="application/json",
+    )
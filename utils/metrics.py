@@ -0,0 +1,206 @@
+import re
+import bisect
+import logging
+import threading
+from functools import lru_cache
+
+from flask import has_request_context, request
+
+slow_query_log = logging.getLogger("slow_query")
+
+# Upper bounds in seconds, roughly log-spaced from 0.5ms to 10s.
+BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"),
+)
+QUANTILES = (0.5, 0.95, 0.99)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|\$\d+")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ARRAY = re.compile(r"\bARRAY\[\s*\?(?:\s*,\s*\?)*\s*\]", re.IGNORECASE)
+_ROW_LIST = re.compile(r"\(\?\+?\)(?:\s*,\s*\(\?\+?\))+")
+_SPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(sql):
+    """Normalise SQL so that statements differing only in literals,
+    placeholders or whitespace aggregate together."""
+    if isinstance(sql, bytes):
+        sql = sql.decode("utf-8", "replace")
+    sql = _STRING.sub("?", sql)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("(?+)", sql)
+    sql = _ARRAY.sub("ARRAY[?+]", sql)
+    sql = _ROW_LIST.sub("(?+),...", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+def current_endpoint():
+    if has_request_context():
+        return request.endpoint or "-"
+    return "-"
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def quantile(self, q):
+        """Estimate a quantile by linear interpolation inside its bucket."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = BUCKETS[index - 1] if index else 0.0
+                upper = BUCKETS[index] if BUCKETS[index] != float("inf") else lower
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return BUCKETS[-2]
+
+
+class QueryStats:
+    def __init__(self):
+        self.latency = Histogram()
+        self.rows = 0
+        self.errors = 0
+
+
+class QueryMetrics:
+    """In-process latency histograms per (endpoint, SQL fingerprint)."""
+
+    # Series recorded once the key cap is reached all land here.
+    OVERFLOW_KEY = ("-", "other")
+
+    def __init__(self, slow_query_seconds, max_series=1000):
+        self.slow_query_seconds = slow_query_seconds
+        self.max_series = max_series
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, sql, seconds, rows=0, error=False):
+        endpoint = current_endpoint()
+        key = (endpoint, fingerprint(sql))
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                if len(self._stats) >= self.max_series:
+                    key = self.OVERFLOW_KEY
+                    stats = self._stats.get(key)
+                if stats is None:
+                    stats = self._stats[key] = QueryStats()
+            stats.latency.observe(seconds)
+            if rows and rows > 0:
+                stats.rows += rows
+            if error:
+                stats.errors += 1
+        if seconds >= self.slow_query_seconds:
+            slow_query_log.warning(
+                f"slow query {seconds * 1000:.1f}ms endpoint={endpoint} rows={rows} sql={key[1]}"
+            )
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                key: {
+                    "count": stats.latency.count,
+                    "errors": stats.errors,
+                    "rows": stats.rows,
+                    "seconds_total": stats.latency.total,
+                    "buckets": list(stats.latency.counts),
+                    "quantiles": {q: stats.latency.quantile(q) for q in QUANTILES},
+                }
+                for key, stats in self._stats.items()
+            }
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _histogram_lines(name, labels, buckets, total, count):
+    lines = []
+    cumulative = 0
+    prefix = f"{labels}," if labels else ""
+    for bound, bucket_count in zip(BUCKETS, buckets):
+        cumulative += bucket_count
+        le = "+Inf" if bound == float("inf") else repr(bound)
+        lines.append(f'{name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{name}_sum{suffix} {total}")
+    lines.append(f"{name}_count{suffix} {count}")
+    return lines
+
+
+def render_prometheus(query_metrics, pool_stats=None, statement_stats=None, cache_stats=None,
+                      audit_stats=None, audit_flush_latency=None):
+    """Render metrics in the Prometheus text exposition format."""
+    lines = [
+        "# HELP db_query_duration_seconds Latency of database statements.",
+        "# TYPE db_query_duration_seconds histogram",
+    ]
+    snapshot = query_metrics.snapshot()
+    for (endpoint, sql), stats in snapshot.items():
+        labels = f'endpoint="{_label(endpoint)}",query="{_label(sql)}"'
+        lines += _histogram_lines(
+            "db_query_duration_seconds", labels, stats["buckets"], stats["seconds_total"], stats["count"]
+        )
+
+    lines += [
+        "# HELP db_query_duration_quantile_seconds Estimated latency quantiles.",
+        "# TYPE db_query_duration_quantile_seconds gauge",
+    ]
+    for (endpoint, sql), stats in snapshot.items():
+        labels = f'endpoint="{_label(endpoint)}",query="{_label(sql)}"'
+        for q, value in stats["quantiles"].items():
+            lines.append(f'db_query_duration_quantile_seconds{{{labels},quantile="{q}"}} {value}')
+
+    for name, field, help_text in (
+        ("db_query_rows_total", "rows", "Rows returned or affected."),
+        ("db_query_errors_total", "errors", "Statements that raised."),
+    ):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        for (endpoint, sql), stats in snapshot.items():
+            labels = f'endpoint="{_label(endpoint)}",query="{_label(sql)}"'
+            lines.append(f"{name}{{{labels}}} {stats[field]}")
+
+    pool_keys = sorted({key for values in (pool_stats or {}).values() for key in values})
+    for key in pool_keys:
+        lines.append(f"# TYPE db_pool_{key} gauge")
+        for pool, values in pool_stats.items():
+            if key in values:
+                lines.append(f'db_pool_{key}{{pool="{_label(pool)}"}} {values[key]}')
+    for key, value in (statement_stats or {}).items():
+        lines.append(f"# TYPE db_prepared_statements_{key} counter")
+        lines.append(f"db_prepared_statements_{key} {value}")
+    cache_keys = sorted({key for values in (cache_stats or {}).values() for key in values})
+    for key in cache_keys:
+        lines.append(f"# TYPE cache_{key} gauge")
+        for cache, values in cache_stats.items():
+            if key in values:
+                lines.append(f'cache_{key}{{cache="{_label(cache)}"}} {values[key]}')
+    for key, value in (audit_stats or {}).items():
+        lines.append(f"# TYPE audit_{key} gauge")
+        lines.append(f"audit_{key} {value}")
+    if audit_flush_latency is not None:
+        lines += [
+            "# HELP audit_flush_duration_seconds Latency of write-behind audit batch inserts.",
+            "# TYPE audit_flush_duration_seconds histogram",
+        ]
+        lines += _histogram_lines(
+            "audit_flush_duration_seconds", "", list(audit_flush_latency.counts),
+            audit_flush_latency.total, audit_flush_latency.count,
+        )
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,36 @@
+import json
+import base64
+from datetime import date, datetime
+
+
+def encode_cursor(*values):
+    """Pack keyset values into an opaque, URL-safe cursor token."""
+    payload = [value.isoformat() if isinstance(value, (date, datetime)) else value for value in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _coerce(value, kind):
+    if kind is datetime:
+        if not isinstance(value, str):
+            raise ValueError("Invalid cursor")
+        return datetime.fromisoformat(value)
+    if kind is int:
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise ValueError("Invalid cursor")
+        return value
+    raise TypeError(f"Unsupported cursor value type {kind!r}")
+
+
+def decode_cursor(token, *kinds):
+    """Unpack a cursor produced by encode_cursor into values of ``kinds``
+    (``datetime`` or ``int``); raises ValueError if it is malformed, so a
+    forged cursor is rejected before it reaches SQL."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except Exception as ex:
+        raise ValueError("Invalid cursor") from ex
+    if not isinstance(values, list) or len(values) != len(kinds):
+        raise ValueError("Invalid cursor")
+    return [_coerce(value, kind) for value, kind in zip(values, kinds)]
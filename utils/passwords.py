@@ -0,0 +1,115 @@
+import os
+import hmac
+import base64
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+SCHEME = "scrypt"
+VERSION = "1"
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+def legacy_sha256(password):
+    """The original unsalted SHA-256 format, kept only to verify old rows."""
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+class PasswordHasher:
+    """scrypt hashing on a bounded worker pool.
+
+    Hashes are stored as ``scrypt$1$<n>$<r>$<p>$<salt>$<key>`` so the cost
+    parameters can be raised later without breaking stored hashes. OpenSSL
+    releases the GIL while deriving, so worker threads run in parallel while
+    request threads only wait on the result. At most ``queue_limit``
+    derivations may be queued or running; beyond that callers get
+    PasswordHasherBusy instead of piling up behind the pool.
+    """
+
+    def __init__(self, workers=None, queue_limit=64, n=2 ** 14, r=8, p=1):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_limit = queue_limit
+        self.n, self.r, self.p = n, r, p
+        self._in_flight = 0
+        self._rejected = 0
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._in_flight = 0
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix="password-hash"
+                    )
+                    self._pid = os.getpid()
+        return self._executor
+
+    def _release(self, _=None):
+        with self._lock:
+            self._in_flight -= 1
+
+    def _run(self, fn, *args):
+        executor = self._pool()
+        with self._lock:
+            if self._in_flight >= self.queue_limit:
+                self._rejected += 1
+                raise PasswordHasherBusy("Too many password hashes in flight")
+            self._in_flight += 1
+        try:
+            future = executor.submit(fn, *args)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return future.result()
+
+    def _derive(self, password, salt, n, r, p):
+        return hashlib.scrypt(
+            password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * r * (n + p + 2)
+        )
+
+    def _hash(self, password):
+        salt = os.urandom(16)
+        key = self._derive(password, salt, self.n, self.r, self.p)
+        return f"{SCHEME}${VERSION}${self.n}${self.r}${self.p}${_b64(salt)}${_b64(key)}"
+
+    def _verify(self, password, stored):
+        if "$" not in stored:
+            return hmac.compare_digest(legacy_sha256(password), stored), True
+        scheme, version, n, r, p, salt, key = stored.split("$")
+        if scheme != SCHEME or version != VERSION:
+            return False, False
+        n, r, p = int(n), int(r), int(p)
+        derived = self._derive(password, base64.b64decode(salt), n, r, p)
+        ok = hmac.compare_digest(derived, base64.b64decode(key))
+        return ok, (n, r, p) != (self.n, self.r, self.p)
+
+    def hash(self, password):
+        return self._run(self._hash, password)
+
+    def verify(self, password, stored):
+        """Return ``(matches, needs_rehash)`` for a stored hash of any
+        supported version."""
+        if "$" not in stored:
+            # Legacy SHA-256 is cheap; no need to queue it.
+            return self._verify(password, stored)
+        return self._run(self._verify, password, stored)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_limit": self.queue_limit,
+                "in_flight": self._in_flight,
+                "rejected": self._rejected,
+            }
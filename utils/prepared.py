@@ -0,0 +1,108 @@
+import re
+import threading
+import itertools
+import weakref
+from collections import OrderedDict
+
+from psycopg2 import errors
+
+_PLACEHOLDER = re.compile(r"%\((\w+)\)s|%s|%%")
+_statement_ids = itertools.count(1)
+
+
+class PreparedStatement:
+    """A SQL string rewritten from psycopg2 placeholders to ``$n`` form."""
+
+    def __init__(self, sql):
+        self.name = f"rds_ps_{next(_statement_ids)}"
+        self.param_names = []
+        self.param_count = 0
+
+        def replace(match):
+            token = match.group(0)
+            if token == "%%":
+                return "%"
+            name = match.group(1)
+            if name is None:
+                self.param_count += 1
+                return f"${self.param_count}"
+            if name not in self.param_names:
+                self.param_names.append(name)
+                self.param_count += 1
+            return f"${self.param_names.index(name) + 1}"
+
+        self.prepare_sql = f"PREPARE {self.name} AS {_PLACEHOLDER.sub(replace, sql)}"
+        placeholders = ", ".join(["%s"] * self.param_count)
+        self.execute_sql = f"EXECUTE {self.name} ({placeholders})" if self.param_count else f"EXECUTE {self.name}"
+
+    def arguments(self, params):
+        if self.param_names:
+            return [params[name] for name in self.param_names]
+        return tuple(params or ())
+
+
+class StatementCache:
+    """LRU of server-side prepared statements for a single connection."""
+
+    def __init__(self, max_size, stats):
+        self.max_size = max_size
+        self.stats = stats
+        self._statements = OrderedDict()
+
+    def execute(self, cursor, sql, params):
+        statement = self._statements.get(sql)
+        if statement is not None:
+            self._statements.move_to_end(sql)
+            self.stats.record("hits")
+        else:
+            self.stats.record("misses")
+            statement = PreparedStatement(sql)
+            setup = [statement.prepare_sql]
+            while len(self._statements) >= self.max_size:
+                _, evicted = self._statements.popitem(last=False)
+                setup.insert(0, f"DEALLOCATE {evicted.name}")
+                self.stats.record("evictions")
+            cursor.execute(";".join(setup))
+            self._statements[sql] = statement
+        try:
+            cursor.execute(statement.execute_sql, statement.arguments(params) or None)
+        except (errors.InvalidSqlStatementName, errors.FeatureNotSupported):
+            # Statement vanished server-side or its result shape changed
+            # (e.g. a schema change under SELECT *); re-prepare next time.
+            self._statements.pop(sql, None)
+            self.stats.record("invalidations")
+            raise
+
+
+class StatementStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def record(self, key):
+        with self._lock:
+            self._counts[key] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+class StatementCacheRegistry:
+    """Per-connection statement caches. A cache lives exactly as long as its
+    connection, so a reconnect always starts from an empty cache."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.stats = StatementStats()
+        self._caches = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def for_connection(self, conn):
+        cache = self._caches.get(conn)
+        if cache is None:
+            with self._lock:
+                cache = self._caches.get(conn)
+                if cache is None:
+                    cache = self._caches[conn] = StatementCache(self.max_size, self.stats)
+        return cache
@@ -1,71 +1,374 @@
+import os
+import math
+import time
 import logging
+import threading
+import itertools
 import boto3
+import psycopg2
+from psycopg2.extras import execute_values
+from contextlib import contextmanager
+from flask import g, has_app_context
 from .connection import Connection
 from .config import Config
+from .copy_stream import copy_rows_in
+from .row_encoder import EncoderCache, RowSet
+from .prepared import StatementCacheRegistry
+from .metrics import QueryMetrics, render_prometheus
+from .routing import WRITE_PIN_COOKIE, WRITE_PIN_HEADER, WritePins, client_write_time, current_user_key
+
+PRIMARY = "primary"
+REPLICA = "replica"
+
+
+class _Lease:
+    __slots__ = ("pool", "conn", "broken")
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.conn = pool.getconn()
+        self.broken = False
+
+    def release(self):
+        self.pool.putconn(self.conn, discard=self.broken)
+
+
+def release_request_connection(exc=None):
+    """Return the connections borrowed during this app context to their pools."""
+    leases = g.pop("db_leases", None)
+    for lease in (leases or {}).values():
+        lease.release()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def attach_write_pin(response):
+    """after_request hook: hand the client the time of this request's write,
+    so its next reads are pinned to the primary whichever worker serves them."""
+    wrote_at = g.get("db_wrote_at") if has_app_context() else None
+    if wrote_at is not None:
+        value = f"{wrote_at:.3f}"
+        response.headers[WRITE_PIN_HEADER] = value
+        response.set_cookie(
+            WRITE_PIN_COOKIE, value,
+            max_age=math.ceil(Config.read_your_writes_seconds), httponly=True, samesite="Lax",
+        )
+    return response
+
+
+def get_cloud_client(service):
+    """Return a boto3 client for ``service``, created once per process."""
+    key = (os.getpid(), service)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = boto3.client(service)
+    return client
+
+
+class Transaction:
+    """Statements issued on one cursor and committed once by RDSHelper.transaction."""
+
+    def __init__(self, helper, cursor):
+        self.helper = helper
+        self.cursor = cursor
+        self._pending = []
+        self._after_commit = []
+
+    def query(self, sql, params=None, prepare=False):
+        self.flush()
+        self.helper._execute(self.cursor, sql, params or {}, prepare)
+        return self.helper._convert_result_to_dict(self.cursor.fetchall(), self.cursor.description)
+
+    def execute(self, sql, params=None, prepare=False):
+        self.flush()
+        self.helper._execute(self.cursor, sql, params or {}, prepare)
+        return self.cursor.rowcount
+
+    def execute_returning_id(self, sql, params=None, prepare=False):
+        self.flush()
+        self.helper._execute(self.cursor, sql, params or {}, prepare)
+        return self.cursor.fetchone()[0]
+
+    def execute_values(self, sql, rows, template=None, page_size=1000, fetch=False):
+        self.flush()
+        started = time.perf_counter()
+        error = False
+        try:
+            return execute_values(self.cursor, sql, rows, template=template, page_size=page_size, fetch=fetch)
+        except Exception:
+            error = True
+            raise
+        finally:
+            query_metrics.record(sql, time.perf_counter() - started, 0 if error else len(rows), error)
+
+    def copy_rows_in(self, table, columns, rows):
+        self.flush()
+        copy_rows_in(self.cursor, table, columns, rows)
+
+    def defer(self, sql, params=None):
+        """Queue a statement whose result is not needed; queued statements
+        are sent together in a single round trip."""
+        self._pending.append(self.cursor.mogrify(sql, params or None))
+
+    def after_commit(self, callback):
+        """Run ``callback`` once the transaction has committed; it is dropped
+        if the transaction rolls back."""
+        self._after_commit.append(callback)
+
+    def flush(self):
+        if self._pending:
+            statements, self._pending = self._pending, []
+            self.helper._execute(self.cursor, b";\n".join(statements), None)
+
+
+_cursor_ids = itertools.count(1)
+_row_encoders = EncoderCache()
+_statement_caches = StatementCacheRegistry(Config.prepared_cache_size)
+query_metrics = QueryMetrics(Config.slow_query_ms / 1000, Config.metrics_max_series)
+_write_pins = WritePins(Config.read_your_writes_seconds)
 
 
 class RDSHelper:
     def __init__(self, dno_name=None, config=None):
         self.config = config or Config(dno_name)
-        self.connection = Connection.getInstance(config=self.config)
+        self.pool = Connection.getInstance(config=self.config)
+        self._own_leases = {}
+
+    @property
+    def client(self):
+        return get_cloud_client('rds')
+
+    def _leases(self):
+        if has_app_context():
+            leases = g.get("db_leases")
+            if leases is None:
+                leases = g.db_leases = {}
+            return leases
+        return self._own_leases
 
-        if not self._is_connection_alive():
-            raise Exception("DB Connectivity Issue")
+    def _lease(self, role):
+        leases = self._leases()
+        lease = leases.get(role)
+        if lease is None:
+            pool = self.pool if role == PRIMARY else Connection.getReadPool(self.config)
+            lease = leases[role] = _Lease(pool)
+        return lease
 
-        self.client = boto3.client('rds')
+    @property
+    def connection(self):
+        """Connection to the primary; used for commands and transactions."""
+        return self._lease(PRIMARY).conn
 
-    def _is_connection_alive(self):
+    @property
+    def read_connection(self):
+        """Connection for plain reads: a replica, unless none is configured or
+        the current user wrote recently (read-your-writes)."""
+        if not self.config.replica_dsns or self._reads_pinned():
+            return self.connection
         try:
-            cursor = self.connection.cursor()
-            cursor.execute("SELECT 1;")
-            cursor.fetchall()
-            logging.info("DB connection is alive")
-            return True
+            return self._lease(REPLICA).conn
         except Exception as ex:
-            logging.error(f"DB connection failed: {ex}")
-            return False
+            logging.error(f"Replica unavailable, reading from primary: {ex}")
+            return self.connection
+
+    def read_pool(self):
+        """Pool that read_connection would borrow from, for work that manages
+        its own connection (e.g. streaming COPY)."""
+        if not self.config.replica_dsns or self._reads_pinned():
+            return self.pool
+        return Connection.getReadPool(self.config)
+
+    def _reads_pinned(self):
+        if PRIMARY in self._leases() and has_app_context() and g.get("db_wrote"):
+            return True
+        # The client echoes this value back, so it is untrusted: a time in
+        # the future would otherwise pin its reads to the primary for good.
+        wrote_at = client_write_time()
+        if wrote_at is not None and 0 <= time.time() - wrote_at < self.config.read_your_writes_seconds:
+            return True
+        return _write_pins.is_pinned(current_user_key())
+
+    def _record_write(self):
+        if has_app_context():
+            g.db_wrote = True
+            g.db_wrote_at = time.time()
+        _write_pins.pin(current_user_key())
+
+    def _mark_broken(self, ex, conn=None):
+        if isinstance(ex, (psycopg2.OperationalError, psycopg2.InterfaceError)):
+            for lease in self._leases().values():
+                if conn is None or lease.conn is conn:
+                    lease.broken = True
+
+    def close(self):
+        leases, self._own_leases = self._own_leases, {}
+        for lease in leases.values():
+            lease.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _execute(self, cursor, sql, params, prepare=False):
+        started = time.perf_counter()
+        error = False
+        try:
+            if prepare:
+                _statement_caches.for_connection(cursor.connection).execute(cursor, sql, params)
+            else:
+                cursor.execute(sql, params)
+        except Exception:
+            error = True
+            raise
+        finally:
+            rows = 0 if error else cursor.rowcount
+            query_metrics.record(sql, time.perf_counter() - started, rows, error)
+
+    @staticmethod
+    def prepared_statement_stats():
+        return _statement_caches.stats.snapshot()
+
+    @staticmethod
+    def render_metrics(cache_stats=None, audit_stats=None, audit_flush_latency=None):
+        return render_prometheus(
+            query_metrics,
+            pool_stats=Connection.stats(),
+            statement_stats=_statement_caches.stats.snapshot(),
+            cache_stats=cache_stats,
+            audit_stats=audit_stats,
+            audit_flush_latency=audit_flush_latency,
+        )
 
     def _convert_result_to_dict(self, rows, description):
         column_names = [col[0] for col in description]
         return [dict(zip(column_names, row)) for row in rows]
 
-    def execute_query(self, sql, params=None):
+    def execute_query(self, sql, params=None, prepare=False, primary=False):
+        """Rows as dicts. Reads go to a replica when one is configured; pass
+        ``primary=True`` for reads that must not lag behind commits."""
         params = params or {}
+        conn = None
         try:
-            cursor = self.connection.cursor()
-            cursor.execute(sql, params)
+            conn = self.connection if primary else self.read_connection
+            cursor = conn.cursor()
+            self._execute(cursor, sql, params, prepare)
             rows = cursor.fetchall()
             result = self._convert_result_to_dict(rows, cursor.description)
             cursor.close()
             return result
         except Exception as ex:
+            self._mark_broken(ex, conn)
             logging.error(f"Query execution failed: {ex}")
             raise
 
-    def execute_command(self, sql, params=None):
+    def execute_query_rows(self, sql, params=None, prepare=False):
+        """Like execute_query, but returns a RowSet that serialises the raw
+        tuples straight to JSON instead of building a dict per row."""
         params = params or {}
+        conn = None
         try:
-            cursor = self.connection.cursor()
-            cursor.execute(sql, params)
+            conn = self.read_connection
+            cursor = conn.cursor()
+            self._execute(cursor, sql, params, prepare)
+            rows = cursor.fetchall()
+            result = RowSet(_row_encoders.get(sql, cursor.description), rows)
+            cursor.close()
+            return result
+        except Exception as ex:
+            self._mark_broken(ex, conn)
+            logging.error(f"Query execution failed: {ex}")
+            raise
+
+    def execute_query_iter(self, sql, params=None, itersize=None):
+        """Yield rows as dicts from a server-side cursor, fetching
+        ``itersize`` rows per round trip instead of the whole result."""
+        params = params or {}
+        conn = cursor = None
+        try:
+            conn = self.read_connection
+            cursor = conn.cursor(name=f"rds_iter_{next(_cursor_ids)}")
+            cursor.itersize = itersize or self.config.stream_itersize
+            self._execute(cursor, sql, params)
+            column_names = None
+            for row in cursor:
+                if column_names is None:
+                    column_names = [col[0] for col in cursor.description]
+                yield dict(zip(column_names, row))
+        except Exception as ex:
+            self._mark_broken(ex, conn)
+            logging.error(f"Streaming query failed: {ex}")
+            raise
+        finally:
+            if cursor is not None and not cursor.closed:
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+
+    def execute_command(self, sql, params=None, prepare=False):
+        params = params or {}
+        cursor = self.connection.cursor()
+        try:
+            self._execute(cursor, sql, params, prepare)
             self.connection.commit()
+            self._record_write()
             affected = cursor.rowcount
             cursor.close()
             return affected
         except Exception as ex:
-            self.connection.rollback()
+            self._rollback(ex)
             logging.error(f"Command execution failed: {ex}")
             raise
 
-    def execute_command_returning_id(self, sql, params=None):
+    def execute_command_returning_id(self, sql, params=None, prepare=False):
         params = params or {}
+        cursor = self.connection.cursor()
         try:
-            cursor = self.connection.cursor()
-            cursor.execute(sql, params)
+            self._execute(cursor, sql, params, prepare)
             new_id = cursor.fetchone()[0]
             self.connection.commit()
+            self._record_write()
             cursor.close()
             return new_id
         except Exception as ex:
-            self.connection.rollback()
+            self._rollback(ex)
             logging.error(f"Insert command failed: {ex}")
             raise
+
+    @contextmanager
+    def transaction(self):
+        cursor = self.connection.cursor()
+        try:
+            tx = Transaction(self, cursor)
+            yield tx
+            tx.flush()
+            self.connection.commit()
+            self._record_write()
+        except Exception as ex:
+            self._rollback(ex)
+            logging.error(f"Transaction failed: {ex}")
+            raise
+        finally:
+            cursor.close()
+        for callback in tx._after_commit:
+            callback()
+
+    def _rollback(self, ex):
+        # Only roll back a connection already borrowed; borrowing one here
+        # would wait out the pool timeout again when the borrow itself failed.
+        lease = self._leases().get(PRIMARY)
+        if lease is None:
+            return
+        conn = lease.conn
+        self._mark_broken(ex, conn)
+        try:
+            conn.rollback()
+        except Exception as rollback_ex:
+            self._mark_broken(rollback_ex, conn)
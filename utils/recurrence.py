@@ -0,0 +1,170 @@
+import heapq
+import logging
+from datetime import datetime, timedelta, timezone
+
+from dateutil.parser import isoparse
+from dateutil.relativedelta import relativedelta
+from dateutil.rrule import rrule, rrulestr
+
+from .config import Config
+from .ttl_cache import TTLCache
+
+_rules = TTLCache(Config.rrule_cache_size, Config.rrule_cache_ttl)
+
+_FIXED_PERIODS = {
+    "WEEKLY": timedelta(weeks=1),
+    "DAILY": timedelta(days=1),
+    "HOURLY": timedelta(hours=1),
+    "MINUTELY": timedelta(minutes=1),
+    "SECONDLY": timedelta(seconds=1),
+}
+_MONTH_PERIODS = {"MONTHLY": 1, "YEARLY": 12}
+# Rules with a larger COUNT are treated as open-ended rather than expanded
+# on write to find their last occurrence.
+RECURRENCE_END_MAX_COUNT = 10000
+
+
+def to_naive_utc(value):
+    """Events are stored as naive UTC timestamps; normalise aware inputs."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _rule_parts(rule):
+    """Upper-cased parts of a single-line RRULE, or None for rule sets
+    (RDATE/EXDATE/EXRULE lines) or anything that does not parse."""
+    text = rule.strip()
+    if "\n" in text:
+        return None
+    if text.upper().startswith("RRULE:"):
+        text = text[len("RRULE:"):]
+    try:
+        return dict(item.split("=", 1) for item in text.upper().split(";") if item)
+    except ValueError:
+        return None
+
+
+def aligned_start(rule, dtstart, not_after):
+    """The latest start at or before ``not_after`` that lies a whole number
+    of FREQ x INTERVAL periods after ``dtstart``.
+
+    Expanding from there yields the same occurrences from ``not_after`` on as
+    expanding from ``dtstart``, because every default the rule takes from its
+    start (weekday, time of day, day of month, month) is preserved. Rules
+    whose occurrences depend on their position in the series (COUNT,
+    BYSETPOS) and rule sets keep ``dtstart``.
+    """
+    if not_after <= dtstart:
+        return dtstart
+    parts = _rule_parts(rule)
+    if parts is None or "COUNT" in parts or "BYSETPOS" in parts:
+        return dtstart
+    try:
+        interval = max(int(parts.get("INTERVAL", 1)), 1)
+    except ValueError:
+        return dtstart
+    freq = parts.get("FREQ")
+    if freq in _FIXED_PERIODS:
+        period = _FIXED_PERIODS[freq] * interval
+        return dtstart + ((not_after - dtstart) // period) * period
+    if freq in _MONTH_PERIODS:
+        step = _MONTH_PERIODS[freq] * interval
+        periods = ((not_after.year - dtstart.year) * 12 + not_after.month - dtstart.month) // step
+        for k in range(periods, 0, -1):
+            # Skip periods where the start's day of month does not exist
+            # (e.g. the 31st), since that would change the rule's default.
+            candidate = dtstart + relativedelta(months=k * step)
+            if candidate.day == dtstart.day and candidate <= not_after:
+                return candidate
+    return dtstart
+
+
+def _as_timestamp(value):
+    """Mirror PostgreSQL's text -> TIMESTAMP cast: any UTC offset is dropped."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.replace(tzinfo=None)
+
+
+def recurrence_end(rule, start_time, end_time=None):
+    """Upper bound on when a recurring event's last occurrence ends, for the
+    events.recurrence_end column; None if the rule is open-ended or cannot be
+    analysed, which readers treat as "may still occur"."""
+    if not rule or not start_time:
+        return None
+    try:
+        start = _as_timestamp(start_time)
+        end = _as_timestamp(end_time) if end_time else start
+        duration = max(end - start, timedelta(0))
+        parts = _rule_parts(rule)
+        if parts is None:
+            return None
+        if "UNTIL" in parts:
+            return to_naive_utc(isoparse(parts["UNTIL"])) + duration
+        if "COUNT" in parts and int(parts["COUNT"]) <= RECURRENCE_END_MAX_COUNT:
+            occurrences = list(rrulestr(rule, dtstart=start))
+            return (occurrences[-1] if occurrences else start) + duration
+    except (ValueError, TypeError, OverflowError):
+        return None
+    return None
+
+
+def compile_rule(event_id, rule, dtstart):
+    """Parse an event's recurrence rule once; the cache key includes the rule
+    text and start so an edited event never reuses a stale compilation.
+    ``dtstart`` is the event's own start, not a window-aligned one, so one
+    entry serves every window."""
+    key = (event_id, rule, dtstart)
+    compiled = _rules.get(key)
+    if compiled is None:
+        compiled = rrulestr(rule, dtstart=dtstart, cache=False)
+        _rules.set(key, compiled)
+    return compiled
+
+
+def _occurrences(event, window_start, window_end):
+    start = event["start_time"]
+    duration = (event["end_time"] - start) if event["end_time"] else timedelta(0)
+    if event["recurrence_rule"]:
+        try:
+            rule = compile_rule(event["id"], event["recurrence_rule"], start)
+            # Start expansion at the last period boundary before the window
+            # instead of walking every occurrence since the event began.
+            dtstart = aligned_start(event["recurrence_rule"], start, window_start - duration)
+            if dtstart != start and isinstance(rule, rrule):
+                rule = rule.replace(dtstart=dtstart)
+            starts = rule.xafter(window_start - duration, inc=True)
+        except (ValueError, TypeError) as ex:
+            logging.warning(f"Ignoring invalid recurrence rule on event {event['id']}: {ex}")
+            starts = iter((start,))
+    else:
+        starts = iter((start,))
+    for occurrence in starts:
+        if occurrence >= window_end:
+            break
+        # Same overlap as event_period(): [start, end), or the instant at
+        # start for occurrences without a duration.
+        if occurrence + duration > window_start or occurrence >= window_start:
+            yield occurrence, event["id"], occurrence + duration, event
+
+
+def expand_occurrences(events, window_start, window_end, limit):
+    """Merge the occurrences of ``events`` inside [window_start, window_end)
+    in start order, expanding each rule only as far as the window needs.
+    Returns ``(occurrences, truncated)``."""
+    merged = heapq.merge(
+        *(_occurrences(event, window_start, window_end) for event in events),
+        key=lambda item: (item[0], item[1]),
+    )
+    result = []
+    for start, event_id, end, event in merged:
+        if len(result) >= limit:
+            return result, True
+        result.append({
+            "event_id": event_id,
+            "title": event["title"],
+            "start_time": start,
+            "end_time": end if event["end_time"] else None,
+        })
+    return result, False
@@ -0,0 +1,156 @@
+import time
+import logging
+import hashlib
+import threading
+
+from .config import Config
+from .rds_helper import RDSHelper
+
+
+class BloomFilter:
+    def __init__(self, size_bits, hashes):
+        self.size_bits = size_bits
+        self.hashes = hashes
+        self._bits = bytearray((size_bits + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size_bits for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def might_contain(self, key):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class LocalRevocationBackend:
+    """In-process stand-in: nothing to share, so publishing is a no-op."""
+
+    def publish(self, jti, expires_at):
+        pass
+
+    def fetch_since(self, cursor):
+        return [], cursor
+
+
+class PostgresRevocationBackend:
+    """Shares revocations between workers through the revoked_tokens table.
+
+    Workers poll for rows newer than their cursor, so the per-request check
+    never touches the database.
+    """
+
+    # Rows become visible at commit but are stamped at transaction start;
+    # re-reading a small window keeps slow commits from being skipped.
+    LOOKBACK = "5 seconds"
+
+    def publish(self, jti, expires_at):
+        RDSHelper().execute_command(
+            """
+            INSERT INTO revoked_tokens (jti, expires_at)
+            VALUES (%s, to_timestamp(%s) AT TIME ZONE 'UTC')
+            ON CONFLICT (jti) DO NOTHING
+            """,
+            (jti, expires_at),
+        )
+
+    def fetch_since(self, cursor):
+        # Read from the primary: a lagging replica could surface rows after
+        # the cursor has moved past them, and they would never be loaded.
+        with RDSHelper() as db:
+            rows = db.execute_query(
+                f"""
+                SELECT jti, revoked_at,
+                       extract(epoch FROM expires_at AT TIME ZONE 'UTC') AS expires_at
+                FROM revoked_tokens
+                WHERE expires_at > NOW() AT TIME ZONE 'UTC'
+                  AND (%s::timestamptz IS NULL OR revoked_at >= %s::timestamptz - interval '{self.LOOKBACK}')
+                """,
+                (cursor, cursor),
+                primary=True,
+            )
+        entries = [(row["jti"], float(row["expires_at"])) for row in rows]
+        # Advance only as far as the data seen, never to the reader's clock.
+        return entries, max((row["revoked_at"] for row in rows), default=cursor)
+
+
+class RevocationList:
+    """Denylist of token JTIs answered from memory.
+
+    A Bloom filter rejects the common case (token not revoked) without
+    touching the exact map; the map confirms hits and holds each JTI only
+    until its token would have expired anyway.
+    """
+
+    def __init__(self, backend, sync_interval=1.0, bloom_bits=1 << 20, bloom_hashes=7):
+        self.backend = backend
+        self.sync_interval = sync_interval
+        self.bloom_bits = bloom_bits
+        self.bloom_hashes = bloom_hashes
+        self._entries = {}
+        self._bloom = BloomFilter(bloom_bits, bloom_hashes)
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._cursor = None
+        self._last_sync = 0.0
+        self._next_purge = 0.0
+
+    def _add(self, jti, expires_at):
+        with self._lock:
+            if expires_at > self._entries.get(jti, 0):
+                self._entries[jti] = expires_at
+                self._bloom.add(jti)
+
+    def revoke(self, jti, expires_at):
+        self._add(jti, expires_at)
+        self.backend.publish(jti, expires_at)
+
+    def is_revoked(self, jti):
+        self._maybe_sync()
+        if not self._bloom.might_contain(jti):
+            return False
+        expires_at = self._entries.get(jti)
+        return expires_at is not None and expires_at > time.time()
+
+    def _maybe_sync(self):
+        now = time.monotonic()
+        if now - self._last_sync < self.sync_interval or not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_sync = now
+            entries, self._cursor = self.backend.fetch_since(self._cursor)
+            for jti, expires_at in entries:
+                self._add(jti, expires_at)
+            if now >= self._next_purge:
+                self._purge()
+                self._next_purge = now + 60
+        except Exception as ex:
+            logging.error(f"Token revocation sync failed: {ex}")
+        finally:
+            self._sync_lock.release()
+
+    def _purge(self):
+        """Drop expired JTIs and rebuild the filter from what is left."""
+        wall = time.time()
+        with self._lock:
+            self._entries = {jti: exp for jti, exp in self._entries.items() if exp > wall}
+            bloom = BloomFilter(self.bloom_bits, self.bloom_hashes)
+            for jti in self._entries:
+                bloom.add(jti)
+            self._bloom = bloom
+
+    def stats(self):
+        return {"entries": len(self._entries)}
+
+
+def build_revocation_list(config=None):
+    config = config or Config()
+    backends = {"local": LocalRevocationBackend, "postgres": PostgresRevocationBackend}
+    return RevocationList(backends[config.revocation_backend](), sync_interval=config.revocation_sync_interval)
+
+
+revoked_tokens = build_revocation_list()
@@ -0,0 +1,68 @@
+import time
+import threading
+from collections import OrderedDict
+
+from flask import has_request_context, request
+from flask_jwt_extended import get_jwt_identity
+
+
+def current_user_key():
+    """Identity of the authenticated user of this request, if any."""
+    if not has_request_context():
+        return None
+    try:
+        return get_jwt_identity()
+    except RuntimeError:
+        return None
+
+
+# Carries the time of a client's last write between its requests, so any
+# worker (and requests without a JWT identity, e.g. right after register)
+# can route the follow-up reads to the primary.
+WRITE_PIN_COOKIE = "db_last_write"
+WRITE_PIN_HEADER = "X-DB-Last-Write"
+
+
+def client_write_time():
+    """Epoch seconds of the caller's last acknowledged write, as echoed back
+    in the header or cookie we set on that write's response; None if absent."""
+    if not has_request_context():
+        return None
+    raw = request.headers.get(WRITE_PIN_HEADER) or request.cookies.get(WRITE_PIN_COOKIE)
+    try:
+        return float(raw)
+    except (TypeError, ValueError):
+        return None
+
+
+class WritePins:
+    """Remembers, per user, until when reads must be served by the primary
+    so a user never reads a replica that has not caught up with their write."""
+
+    def __init__(self, window, max_entries=10000):
+        self.window = window
+        self.max_entries = max_entries
+        self._pins = OrderedDict()
+        self._lock = threading.Lock()
+
+    def pin(self, key):
+        if key is None or self.window <= 0:
+            return
+        with self._lock:
+            self._pins[key] = time.monotonic() + self.window
+            self._pins.move_to_end(key)
+            while len(self._pins) > self.max_entries:
+                self._pins.popitem(last=False)
+
+    def is_pinned(self, key):
+        if key is None:
+            return False
+        until = self._pins.get(key)
+        if until is None:
+            return False
+        if until > time.monotonic():
+            return True
+        with self._lock:
+            if self._pins.get(key) == until:
+                del self._pins[key]
+        return False
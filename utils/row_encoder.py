@@ -0,0 +1,170 @@
+import json
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from uuid import UUID
+
+from flask.json.provider import DefaultJSONProvider
+
+_encode_str = json.encoder.encode_basestring_ascii
+
+
+_WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+_MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+
+def _encode_datetime(value):
+    # Same text as werkzeug's http_date (what jsonify emits), without the
+    # email.utils round trip.
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return '"%s, %02d %s %04d %02d:%02d:%02d GMT"' % (
+        _WEEKDAYS[value.weekday()], value.day, _MONTHS[value.month - 1],
+        value.year, value.hour, value.minute, value.second,
+    )
+
+
+def _encode_date(value):
+    return '"%s, %02d %s %04d 00:00:00 GMT"' % (
+        _WEEKDAYS[value.weekday()], value.day, _MONTHS[value.month - 1], value.year,
+    )
+
+
+_VALUE_ENCODERS = {
+    type(None): lambda value: "null",
+    bool: lambda value: "true" if value else "false",
+    int: int.__repr__,
+    float: json.dumps,
+    str: _encode_str,
+    datetime: _encode_datetime,
+    date: _encode_date,
+    Decimal: lambda value: _encode_str(str(value)),
+    UUID: lambda value: _encode_str(str(value)),
+}
+
+
+_DATE_ENCODERS = {datetime: _encode_datetime, date: _encode_date}
+
+
+def encode_value(value):
+    encoder = _VALUE_ENCODERS.get(type(value))
+    if encoder is not None:
+        return encoder(value)
+    return json.dumps(value, default=DefaultJSONProvider.default, sort_keys=True, separators=(",", ":"))
+
+
+class RowEncoder:
+    """Column metadata for one statement, precomputed so rows can be
+    written as JSON objects straight from their tuples.
+
+    Keys are emitted in sorted order to match the output of ``jsonify``.
+    """
+
+    def __init__(self, column_names):
+        self.column_names = tuple(column_names)
+        order = sorted(range(len(self.column_names)), key=self.column_names.__getitem__)
+        self.order = order
+        self.keys = [_encode_str(self.column_names[i]) + ":" for i in order]
+
+    def encode(self, row):
+        return "{" + ",".join(
+            key + encode_value(row[i]) for key, i in zip(self.keys, self.order)
+        ) + "}"
+
+    def as_dict(self, row):
+        return dict(zip(self.column_names, row))
+
+
+class EncodedRow:
+    __slots__ = ("encoder", "row")
+
+    def __init__(self, encoder, row):
+        self.encoder = encoder
+        self.row = row
+
+    def __getitem__(self, name):
+        return self.row[self.encoder.column_names.index(name)]
+
+    def as_dict(self):
+        return self.encoder.as_dict(self.row)
+
+    def to_json(self):
+        return self.encoder.encode(self.row)
+
+
+class RowSet:
+    """Result rows kept as tuples, serialised without per-row dicts."""
+
+    __slots__ = ("encoder", "rows")
+
+    def __init__(self, encoder, rows):
+        self.encoder = encoder
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __bool__(self):
+        return bool(self.rows)
+
+    def __getitem__(self, index):
+        return EncodedRow(self.encoder, self.rows[index])
+
+    def first(self):
+        return self[0] if self.rows else None
+
+    def as_dicts(self):
+        return [self.encoder.as_dict(row) for row in self.rows]
+
+    def to_json(self):
+        encode = self.encoder.encode
+        return "[" + ",".join(encode(row) for row in self.rows) + "]"
+
+
+class EncoderCache:
+    """Bounded per-process cache of RowEncoders keyed by SQL text."""
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self._encoders = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sql, description):
+        encoder = self._encoders.get(sql)
+        if encoder is not None and len(encoder.column_names) == len(description) and all(
+            name == col[0] for name, col in zip(encoder.column_names, description)
+        ):
+            return encoder
+        encoder = RowEncoder([col[0] for col in description])
+        with self._lock:
+            self._encoders[sql] = encoder
+            self._encoders.move_to_end(sql)
+            while len(self._encoders) > self.max_size:
+                self._encoders.popitem(last=False)
+        return encoder
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider that writes RowSet/EncodedRow results directly and
+    short-circuits datetime/date values before the generic fallback."""
+
+    @staticmethod
+    def default(o):
+        encoder = _DATE_ENCODERS.get(type(o))
+        if encoder is not None:
+            return encoder(o)[1:-1]
+        if isinstance(o, (RowSet, EncodedRow)):
+            return o.as_dict() if isinstance(o, EncodedRow) else o.as_dicts()
+        return DefaultJSONProvider.default(o)
+
+    def dumps(self, obj, **kwargs):
+        if "indent" not in kwargs:
+            if isinstance(obj, (RowSet, EncodedRow)):
+                return obj.to_json()
+            if isinstance(obj, dict) and any(isinstance(v, (RowSet, EncodedRow)) for v in obj.values()):
+                # Envelopes such as {"events": rows, "next_cursor": ...}.
+                return "{" + ",".join(
+                    _encode_str(key) + ":" + self.dumps(obj[key], **kwargs) for key in sorted(obj)
+                ) + "}"
+        return super().dumps(obj, **kwargs)
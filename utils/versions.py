@@ -0,0 +1,107 @@
+from .bulk_events import EVENT_FIELDS
+
+# Rows from the latest snapshot at or below ``first`` up to ``last``, in
+# order; (event_id, version_number) is unique so both bounds use its index.
+VERSION_CHAIN_SQL = """
+    SELECT * FROM event_versions
+    WHERE event_id = %s AND version_number <= %s
+      AND version_number >= (
+          SELECT MAX(version_number) FROM event_versions
+          WHERE event_id = %s AND version_number <= %s AND is_snapshot
+      )
+    ORDER BY version_number
+"""
+
+# The snapshot chain of each target version, tagged with the target; each
+# chain is at most version_snapshot_interval rows however far apart the
+# targets are.
+VERSION_CHAINS_SQL = """
+    SELECT t.target, v.* FROM unnest(%s::int[]) AS t(target)
+    CROSS JOIN LATERAL (
+        SELECT * FROM event_versions
+        WHERE event_id = %s AND version_number <= t.target
+          AND version_number >= (
+              SELECT MAX(version_number) FROM event_versions
+              WHERE event_id = %s AND version_number <= t.target AND is_snapshot
+          )
+    ) v
+    ORDER BY t.target, v.version_number
+"""
+
+
+def is_snapshot_version(version_number, interval):
+    """Every ``interval``-th version (and the first) stores all fields, so
+    any version is at most ``interval - 1`` deltas away from a snapshot."""
+    return version_number == 1 or interval <= 1 or version_number % interval == 0
+
+
+def version_row(event_id, version_number, values, changed, snapshot):
+    """Column values for an event_versions insert: a snapshot carries every
+    field, a delta only the ``changed`` ones (the rest stay NULL)."""
+    return {
+        "event_id": event_id,
+        "version_number": version_number,
+        **{field: values.get(field) if snapshot or field in changed else None for field in EVENT_FIELDS},
+        "changed_fields": list(changed) if changed is not None else None,
+        "is_snapshot": snapshot,
+    }
+
+
+def apply_version(state, row):
+    """Fold one event_versions row onto ``state`` (a full field dict)."""
+    if row["is_snapshot"]:
+        fields = EVENT_FIELDS
+    else:
+        fields = row["changed_fields"] or ()
+    for field in fields:
+        state[field] = row[field]
+    return state
+
+
+def materialize(rows, first=None):
+    """Full records of the versions in ``rows`` from ``first`` on (all of
+    them by default). ``rows`` must start at a snapshot and be ordered by
+    version_number."""
+    if not rows or not rows[0]["is_snapshot"]:
+        return []
+    state = {}
+    versions = []
+    for row in rows:
+        apply_version(state, row)
+        if first is None or row["version_number"] >= first:
+            version = dict(row)
+            version.update(state)
+            version.pop("is_snapshot", None)
+            versions.append(version)
+    return versions
+
+
+def load_version_range(query, event_id, first, last):
+    """Reconstruct versions ``first`` to ``last`` of an event in one query.
+    ``query`` is ``RDSHelper.execute_query`` or ``Transaction.query``."""
+    rows = query(VERSION_CHAIN_SQL, (event_id, last, event_id, first), prepare=True)
+    return materialize(rows, first)
+
+
+def load_version(query, event_id, version_number):
+    """Reconstruct ``version_number`` of an event, or None if it does not exist."""
+    versions = load_version_range(query, event_id, version_number, version_number)
+    if not versions or versions[-1]["version_number"] != version_number:
+        return None
+    return versions[-1]
+
+
+def load_versions(query, event_id, version_numbers):
+    """Reconstruct the given versions of an event, each from its own
+    snapshot chain, in one query. Returns ``{version_number: version}``;
+    versions that do not exist are left out."""
+    targets = sorted(set(version_numbers))
+    chains = {}
+    for row in query(VERSION_CHAINS_SQL, (targets, event_id, event_id), prepare=True):
+        chains.setdefault(row.pop("target"), []).append(row)
+    versions = {}
+    for target, rows in chains.items():
+        materialized = materialize(rows, target)
+        if materialized and materialized[-1]["version_number"] == target:
+            versions[target] = materialized[-1]
+    return versions